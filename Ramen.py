@@ -10,225 +10,191 @@
 
 # For queue (most of these are now legacy from the first implementation)
 import multiprocessing, threading, os, settings, logging, random
-from multiprocessing import Pool, Queue
-from multiprocessing.pool import ThreadPool
-
-# For DB
-import ZODB, ZODB.FileStorage
-import transaction
-import copy
-
-# for debug
-import pdb
 
 #for saving
 import signal
-import pickle
 import sys
 
 # imports all custom modules in the libramen folder.
 from libramen import *
 
 #from file import File
-File = file.File
-
-queue = None
-
-def thread_manager(target_queue):
-    # Handles the queue process in a way that is more resiliant to errors than mapped pools, which can fail on python segfaults.
-    global queue
-    queue = multiprocessing.Queue()
-    [queue.put(target) for target in target_queue]
-    processes = []
-
-    for i in xrange(settings.MAX_THREADS):
-        p = multiprocessing.Process(target=scanprocess,args=([queue]))
-        processes.append(p)
-
-    for p in processes:
-        p.start()
-
-    while queue.qsize()>0 and len(processes) > 0:
-        for p in processes:
-            if p.exitcode is not None and queue.qsize()>0:
-                print "Restarting dead thread -- " + str(queue.qsize()) + " More jobs left"
-                p.join(3)
-                processes.remove(p)
-                del p
-                p = multiprocessing.Process(target=scanprocess,args=([queue]))
-                p.start()
-                processes.append(p)
-            if len(processes) < settings.MAX_THREADS and queue.qsize()>0:
-                print "Thread-starved conditions detected, starting additional threads"
-                for i in range(settings.MAX_THREADS-len(processes)):
-                    print "Started"
-                    p = multiprocessing.Process(target=scanprocess,args=([queue]))
-                    p.start()
-                    processes.append(p)
-            if p.exitcode == 0 and queue.qsize() == 0:
-                processes.remove(p)
-                del p
-                print "Joined thread"
-
-    if queue.qsize()==0:
-        return
-    else:
-        print "Thought i didn't have anything to do but i was wrong, re-starting"
-        thread_manager([queue.get() for i in range(queue.qsize())])
+# Records are the compact replacement for file.File (which is only kept around so old databases load, see migrate.py)
+File = record.Record
+
+scheduler_obj = None
+writer_obj = None
+plugin_obj = None
+# Only send on what changed since the last scan (--incremental, see libramen/snapshot.py)
+incremental = False
 
 def runmodules(fileobj,filesystem):
     # Don't Repeat Yourself - holds the code for running a file object through the user-provided plugins.
+    # Runs in the plugin stage processes (libramen/pluginstage.py), not in the walk.
+    # Plugins store what they find on the file object -- return values are ignored (see plugins/PLUGINS.TXT)
+    # Plugins with a stream() want the contents -- they're collected up and the file is read once for all of them (libramen/content.py)
+    streaming = []
+    # Hashes from an earlier scan of an unchanged file -- the hashing plugins see them and skip reading it (libramen/hashcache.py)
+    hashcache.restore(fileobj)
     # Actions
     for module in actions:
+        if hasattr(module,'stream'):
+            streaming.append(module)
+            continue
         try:
-            fileobj = module.action(fileobj,filesystem)
-        except:
+            module.action(fileobj,filesystem)
+        except Exception:
             print "Action failed"
             import traceback
             print traceback.format_exc()
 
-    # Extensions    
-    for module in extensions:
+    # Extensions -- only the ones whose MATCH/__match__ fit this file (see libramen/dispatch.py)
+    for module in extensions.matching(fileobj):
+        if hasattr(module,'stream'):
+            streaming.append(module)
+            continue
         try:
-            if module.__match__(fileobj):
-                fileobj = module.action(fileobj,filesystem)
-        except:
+            module.action(fileobj,filesystem)
+        except Exception:
             print "Extension Failed."
             import traceback
             print traceback.format_exc()
-    return fileobj
 
-def scanprocess(queue,debug=None):
-
-    if debug is None:
-        # Cute little naming trick for debug only.
-        name = random.randint(0,1000)
-        while queue.qsize()>0:
-            print str(name)+": looking for work"
-            try:
-                # the target is a tuple (targetobject,folder)
-                target = queue.get(True,5)
-                # targetobj = target[0]
-                # folder = target[1]
-            except:
-                print "No work."
-                exit(0)
-            print str(name) +": Got some work : "
-    else:
-        target = debug
+    content.feed(fileobj,filesystem,content.consumers(streaming,fileobj,filesystem))
+    return fileobj
 
-    print target.tostring()
+def scanjob(target,path,stat=None):
+    # One unit of work from the scheduler -- a single directory on a single target.
+    # stat is the folder's stat from it's parent's listing, None for where a target starts (or picks up after --resume).
+    # Returns (full path, stat) for the subdirectories found so the scheduler can hand them out to whoever is free.
 
-    # We should always start with the root - /
     # Note: So one of the weird things that this framework is going to require the plugin-writers to handle is stuff like drive letters in windows.
     # Ideally, you'd take this slash in your filesystem handler, know that it's seeking the "My Computer" and return a list of the connected drives
     # Then, youd let it go to each drive recording the drive letter as another folder in the chain.  That's how i'd do it, anyways.
-    walker = target.filesystem.walk('/') 
-    
-    #determine if this target/fs combo exists already
-    if db.has_key(target.host):
-        if db[target.host].filesystems.has_key(target.filesystem.product):
-            # we already have the object scanned -- get the writeable root and start writing on top of it.
-            pass
-        else:
-            # we have the target, but not the fs
-            db[target.host].filesystems[target.filesystem.product] = target.filesystem
+    # Whoever picks up a job has nothing cached for it -- with the stat the handler knows path is a folder and doesn't have to
+    # list the parent to make sure (see walk() in filesystems/fs.py).
+    if stat is not None:
+        walker = target.filesystem.walk(path,stat)
     else:
-        target.filesystems = {target.filesystem.product:target.filesystem}
-        db[target.host] = target
-    store = db[target.host].filesystems[target.filesystem.product].w_root
-
-    # SO, store now refrences the target and filesystem combo that we have in the db
-    while 1:
-        try:
-            # grab the next batch of files from the next folder
-            fullpath,folders,files = walker.next()
-            print 'walked'
-        
-            # parse and get the rel obj
-            relpath = fullpath.split('/')
-            # make sure that if the path was root (/) that we set it because the split strips single-slashes at the beginning.
-            if relpath[0] == "":
-                relpath[0] = '/'
-
-            print fullpath
-            #posix.stat_result(st_mode=33188, st_ino=2621703, st_dev=2050L, st_nlink=1, st_uid=0, st_gid=0, st_size=30, st_atime=1395927104, st_mtime=1175771922, st_ctime=1393946695)
-            # File signature: class File(filename, relpath, stat, target, folder=False):
-            # stat the folder and save it
-            folderstat = target.filesystem.stat(fullpath)
-            folderobj = File(relpath[-1],fullpath,folderstat,target,True)
-            folderobj = runmodules(folderobj,target.filesystem)
-            store[fullpath] = folderobj
-                        
-            if fullpath[-1] != '/':
-                fullpath = fullpath+'/'
-            
-            # TODO: We need a way to assign the folders attribute to a folder.
-            #folderobj.folders = []
- 
-            # I'm pretty sure this is obsolete code in this iteration but may be useful in the future.
-            #for folder in folders:
-            #    print folder
-            #    subfolderstat = target.filesystem.stat(fullpath+folder)
-            #    subfolderobj = File(folder,fullpath,subfolderstat,target,True)
-            #    subfolderobj = runmodules(subfolderobj,target.filesystem)
-            #    store[fullpath+'/'+folder] = subfolderobj
-                
-    
-            # stat the files in that folder.
-            for file in files:
-                print file
-                filestat = target.filesystem.stat(fullpath+file)
-                # this file is in the folder we just found the position of with folderobj, so we can set its relpath to the folder object.
-                fileobj = File(file, fullpath, filestat, target)
-                fileobj = runmodules(fileobj,target.filesystem)
-                store[fullpath+file] = fileobj
-                
-
-        # we ran out of folder objects
-        except StopIteration:
-            print "finished target " + target.tostring()
-            break
-
-        # A file or folder had an issue, keep going
-        except:
-            print "we encountered an error scanning " + target.tostring()
-            import traceback
-            print traceback.format_exc()
-
-    # Commit
-    transaction.commit()
-
-    print "Gave up looking for work - dying"
-    exit(0)
-
-
-def signal_handler(signal, frame):
-        # Ugh.
-        global queue
+        walker = target.filesystem.walk(path)
+
+    if not getattr(target.filesystem,'splittable',True):
+        # Handlers like http crawl instead of walking a tree, and the parallel walks fan out on their own, so the whole walk is one job.
+        # A tree walk still marks every folder walked as it goes so --resume picks up from the ones that weren't finished.
+        tree = getattr(target.filesystem,'walks_tree',False)
+        count = 0
+        # Folder stats from their parent's listing, a parent always comes out before it's children.
+        known = {}
+        for listing in walker:
+            folder = listing[0] if tree else path
+            subdirs, found = scanfolder(target,listing,folder,known.pop(listing[0],None))
+            known.update(subdirs)
+            if tree:
+                writer_obj.walked(target,folder,[subdir for subdir,substat in subdirs],found)
+            count += found
+        if not tree:
+            writer_obj.walked(target,path,[],count)
+        print "finished target " + target.tostring()
+        return []
+
+    if incremental and getattr(target.filesystem,'prune_dirs',False):
+        # Nothing was added or removed here since last scan -- skip the listing and go on to the subfolders we already know about.
+        subdirs = snapshot.unchanged(target,path,stat if stat is not None else target.filesystem.stat(path))
+        if subdirs is not None:
+            writer_obj.walked(target,path,subdirs,0)
+            return [(subdir,None) for subdir in subdirs]
+
+    # The first thing a top-down walk yields is the listing of the folder we asked for.
+    try:
+        listing = walker.next()
+    except StopIteration:
+        return []
+    subdirs, count = scanfolder(target,listing,path,stat)
+    # Lets the checkpoint know this folder is done once its files are committed.
+    writer_obj.walked(target,path,[subdir for subdir,substat in subdirs],count)
+    return subdirs
+
+def scanfolder(target,listing,job,folderstat=None):
+    # Hands a record for the folder and every file in it to the plugin stage.
+    # Returns (path, stat) for the subfolders and how many records went out.
+    fullpath,folders,files = listing
+
+    # What the last scan stored in this folder, name -> record.  None means send everything.
+    old = snapshot.children(target,fullpath) if incremental else None
+    count = 0
+
+    # parse and get the rel obj
+    relpath = fullpath.split('/')
+    # make sure that if the path was root (/) that we set it because the split strips single-slashes at the beginning.
+    if relpath[0] == "":
+        relpath[0] = '/'
+
+    print fullpath
+    #posix.stat_result(st_mode=33188, st_ino=2621703, st_dev=2050L, st_nlink=1, st_uid=0, st_gid=0, st_size=30, st_atime=1395927104, st_mtime=1175771922, st_ctime=1393946695)
+    # File signature: class File(filename, relpath, stat, target, folder=False):
+    # stat the folder and save it -- unless it's parent's listing already did.
+    if folderstat is None:
+        folderstat = target.filesystem.stat(fullpath)
+    folderobj = File(relpath[-1],fullpath,folderstat,target,True)
+    # Kept so an incremental rescan can tell the folder hasn't changed without listing it (see libramen/snapshot.py)
+    folderobj.attrs = {'nlink':record._statfield(folderstat,'st_nlink',3)}
+    if old is None or snapshot.changed(snapshot.record(target,fullpath),folderobj):
+        plugin_obj.put(target,fullpath,folderobj,job)
+        count += 1
+
+    if fullpath[-1] != '/':
+        fullpath = fullpath+'/'
+
+    # TODO: We need a way to assign the folders attribute to a folder.
+    #folderobj.folders = []
+
+    # stat the files in that folder -- all at once if the handler can.  The subfolders too, that's their folder stat when they get scanned.
+    stats = utils.stat_many(target.filesystem,fullpath,files+folders)
+    filestats = stats[:len(files)]
+    for file,filestat in zip(files,filestats):
+        print file
+        # this file is in the folder we just found the position of with folderobj, so we can set its relpath to the folder object.
+        fileobj = File(file, fullpath, filestat, target)
+        if old is not None and not snapshot.changed(old.get(file),fileobj):
+            # Same as last time, the record (and whatever the plugins found) is already in the db.
+            continue
+        plugin_obj.put(target,fullpath+file,fileobj,job)
+        count += 1
+
+    if old is not None:
+        # Anything stored last time that isn't here now is gone.
+        here = set(files) | set(folders)
+        for name,gone in old.items():
+            if name not in here and getattr(gone,'deleted',None) is None:
+                writer_obj.deleted(target,fullpath+name)
+
+    return zip([fullpath+folder for folder in folders],stats[len(files):]), count
+
+
+def signal_handler(signum, frame):
+        # Only the main process gets here, the workers ignore ctrl-c and wait for us to send them home.
+        # A second ctrl-c while we're flushing would leave the database half written.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
 
         print " -- SIGINT DETECTED, FLUSHING TO DISK -- "
-        transaction.commit()
-        pdb.set_trace()
-
-
-        # Todo: Save queue status
-        ## snapshot the queue of targets
-        #queue.close()
-        #queue_snapshot = []
-        #while not queue.empty():
-        #    queue_snapshot.append(queue.get())
-        ## save the queue to disk
-        #with open('data/queue.tmp',w) as tmpqueue:
-        #    tmpqueue.write(pickle.dumps(tmpqueue))
-        ## Todo: we save the targets, their FS's, and therefore their file trees - we should be able to extrapolate what position we were at when we saved to disk using this info.
-
-        print " -- Finished! -- "
+        # Scanners first so the plugin workers keep draining while they finish the folder they're on.  Whatever was still
+        # queued for the plugins gets redone on --resume.
+        if scheduler_obj is not None:
+            scheduler_obj.stop()
+        if plugin_obj is not None:
+            plugin_obj.abort()
+        # The writer saves the checkpoint along with its last commit, run again with --resume to pick up where we left off.
+        if writer_obj is not None:
+            writer_obj.stop()
+
+        print " -- Finished! Run again with --resume to pick up where we left off -- "
         sys.exit()
 
     
 if __name__ == '__main__':
     signal.signal(signal.SIGINT, signal_handler)
+    resume = '--resume' in sys.argv
+    incremental = '--incremental' in sys.argv or getattr(settings,'INCREMENTAL',False)
     target_queue = []
     actions = []
     extensions = []
@@ -243,14 +209,6 @@ if __name__ == '__main__':
         if len(targets)<1:
             print "You did not specify anything to scan in your target file."
 
-    print "Loading ZODB storage and connection"
-    # Warning: Globals loaded here
-    storage = ZODB.FileStorage.FileStorage('data/mydata.fs')
-    db_c = ZODB.DB(storage)
-    connection = db_c.open()
-    db = connection.root()
-
-
     #TODO: Make the collections a user-settable thing in case they need multiple "sites"
     # We want to emulate NEXPOSE's collections -- sites -> targets -> vulnerabilities
     #db['collection-1'] = {}
@@ -260,7 +218,7 @@ if __name__ == '__main__':
     actions = utils.loadmodules('plugins/actions')
 
     print "Importing extensions"
-    extensions = utils.loadmodules('plugins/extensions')
+    extensions = utils.loadextensions('plugins/extensions')
 
     print "Importing Filesystems"
     filesystem_import_test = utils.loadmodules('filesystems')
@@ -279,10 +237,32 @@ if __name__ == '__main__':
         print "No valid targets - exiting."
         exit(1)
 
-    #debug mode only remove.
-    for target in targets:
-        scanprocess(None,target)
+    checkpoint_obj = checkpoint.Checkpoint()
+    if resume:
+        if checkpoint_obj.load():
+            print "Resuming from " + checkpoint_obj.path
+        else:
+            print "No checkpoint found, starting from scratch"
+
+    # Warning: Globals loaded here
+    # Everything the workers find is streamed to a single writer process that owns the ZODB connection.
+    writer_obj = writer.Writer(targets,checkpoint=checkpoint_obj)
+    writer_obj.start()
+
+    # Plugins get their own pool so expensive ones (hashing...) don't slow the walk down.
+    plugin_obj = pluginstage.PluginStage(targets,runmodules,writer_obj)
+    plugin_obj.start()
 
     # where the magic happens
     print "Scanning targets"
-    thread_manager(targets)
+    frontier = {}
+    for target in targets:
+        key = (target.host,target.filesystem.product)
+        frontier[key] = checkpoint_obj.remaining(key)
+    scheduler_obj = scheduler.Scheduler(targets,scanjob,frontier=frontier)
+    scheduler_obj.run()
+
+    plugin_obj.stop()
+    writer_obj.stop()
+    # Everything made it, nothing to resume.
+    checkpoint_obj.clear()
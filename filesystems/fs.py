@@ -1,6 +1,7 @@
 #!/usr/bin/python
 import pdb
 import imp
+import posixpath
 
 # If you need additional settings/setup/passwords/whatever, you set them in a companion settings file found in the fs_settings folder.
 # If one wanted to use the settings from the settings file for Ramen itself, one would specify that file instead of one in fs_settings.
@@ -14,6 +15,23 @@ settings = imp.load_source('settings','fs_settings/fs.py')
 
 class filesystem:
 
+    # The scheduler hands out one directory at a time by taking the first listing walk(path) yields.
+    # Set this to False if your walk() can't start from an arbitrary folder (crawlers and such) and the whole walk will be run as one job.
+    splittable = True
+
+    # Only matters when splittable is False.  Set it if walk() still yields every folder of the tree once (a parallel walk...),
+    # so each folder gets checkpointed as it's done and --resume doesn't have to start the whole target over.
+    walks_tree = False
+
+    # Like os.walk, yields (dirpath, dirs, files) -- required.  stat is path's stat from it's parent's listing when the scheduler has one,
+    # so you don't have to check path is a folder before listing it.
+    def walk(self,path,stat=None):
+        return iter([])
+
+    # Set this if a folder's mtime changes whenever something inside it is added, removed or renamed (local disks, unix FTP servers).
+    # An incremental rescan (--incremental) then skips listing folders whose mtime and link count haven't changed.
+    prune_dirs = False
+
     def __init__(self,ip,uri,username,password):
         # placeholder -- this is stuff you would need if you were using authenticated HTTP as your FS
         self.ip = ip
@@ -25,6 +43,12 @@ class filesystem:
         stat = None # code for returning a tuple like os.stat()
         return stat
 
+    # Optional -- stats every name in one folder, returning the results in the same order as names.
+    # If your protocol hands you the metadata for a whole folder at once (an FTP LIST, a WebDAV PROPFIND...) do it here and save a round trip per file.
+    # Leave it out and the scanner loops over stat() for you (see utils.stat_many).
+    def stat_many(self,dirpath,names):
+        return [self.stat(posixpath.join(dirpath,name)) for name in names]
+
     def open(self,path):
         new_fd = fd(path)
         return new_fd
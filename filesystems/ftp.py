@@ -1,9 +1,14 @@
 #!/usr/bin/python
 import imp
-from BTrees import OOBTree
+import copy
+import stat as stat_module
+from libramen import pathindex
+from libramen import utils
 import persistent
 import ftplib
 import ftputil
+import ftputil.stat
+import ftputil.tool
 import pdb
 # If you need additional settings/setup/passwords/whatever, you set them in a companion settings file found in the fs_settings folder.
 # If one wanted to use the settings from the settings file for Ramen itself, one would specify that file instead of one in fs_settings.
@@ -14,10 +19,27 @@ product = 'ftp'
 class filesystem(persistent.Persistent):
 
     def __init__(self,host):
-        self.host = ftputil.FTPHost(host,settings.username,settings.password,session_factory=ftplib.FTP)
+        self.host = self._setup(ftputil.FTPHost(host,settings.username,settings.password,session_factory=ftplib.FTP))
         self.product = "ftp"
         # required
-        self.root = OOBTree.OOBTree()
+        self.root = pathindex.PathIndex()
+
+    def _setup(self,host):
+        # Cache whole LISTs per folder -- walk() pins the folder it's in so a huge sibling can't push it out and make us LIST it again.
+        host.stat_cache.by_directory = True
+        # Don't CWD there and back around every LIST (see listing_mode in fs_settings/ftp.py).
+        host.listing_mode = getattr(settings,'listing_mode','track')
+        # The plugins open file after file, reuse the logged-in sessions for that instead of logging in again.
+        host.max_idle_children = getattr(settings,'max_idle_sessions',host.max_idle_children)
+        host.child_idle_timeout = getattr(settings,'session_idle_timeout',host.child_idle_timeout)
+        host.child_check_interval = getattr(settings,'session_check_interval',host.child_check_interval)
+        return host
+
+    def reopen(self):
+        # Same handler with it's own logged-in session, for a scanner or plugin worker (see utils.reopen).
+        local = copy.copy(self)
+        local.host = self._setup(self.host._copy())
+        return local
 
     def stat(self,path):
         print '.',
@@ -29,6 +51,23 @@ class filesystem(persistent.Persistent):
             print traceback.format_exc()
             return (None,None,None,None,None,None,None,None,None,None)
 
+    def stat_many(self,dirpath,names):
+        listing = getattr(self,'_v_listing',None)
+        if listing is not None and listing[0] == dirpath.rstrip('/'):
+            # walk() just LISTed this folder (see _host_walk and _pool_walk).  Links get followed the slow way.
+            entries = listing[1]
+            return [entries[name] if name in entries and not stat_module.S_ISLNK(entries[name].st_mode)
+                    else self.stat(self.host.path.join(dirpath,name)) for name in names]
+        # Somebody else's walk -- the folder is likely still in ftputil's stat cache.  If it isn't, one more LIST puts it back.
+        paths = [self.host.path.join(dirpath,name) for name in names]
+        if [path for path in paths if path not in self.host.stat_cache]:
+            try:
+                self.host.listdir(dirpath)
+            except:
+                import traceback
+                print traceback.format_exc()
+        return [self.stat(path) for path in paths]
+
     def is_dir(self,path):
         return self.host.path.isdir(path)
 
@@ -48,8 +87,61 @@ class filesystem(persistent.Persistent):
             print traceback.format_exc()
             return False
 
-    def walk(self,path):
-        return self.host.walk(path)
+    def walk(self,path,stat=None):
+        if self.walk_sessions:
+            return self._pool_walk(path,self.walk_sessions)
+        return self._host_walk(path,stat is None)
+
+    def _host_walk(self,top,check_dir=True):
+        # FTPHost.walk LISTs each folder once and hands us the lstats from it, stat_many picks them up from _v_listing so
+        # the scanner doesn't cost a single extra round trip per file.  check_dir=False skips LISTing the parent to make sure top is a folder.
+        for dirpath,dirs,files,entries in self.host.walk(top,stats=True,check_dir=check_dir):
+            self._v_listing = (dirpath.rstrip('/'),entries)
+            yield dirpath,dirs,files
+
+    @property
+    def walk_sessions(self):
+        return getattr(settings,'walk_sessions',0)
+
+    @property
+    def splittable(self):
+        # The pooled walk fans out over it's own sessions, so the scheduler hands it the whole tree as one job.
+        return not self.walk_sessions
+
+    # Even as one job it's still a tree walk, the folders get checkpointed one at a time.
+    walks_tree = True
+
+    def _listdir(self,session,top,check_dir=True):
+        # One LIST on session -- returns (dirs, files, {name: lstat}).  check_dir=False when top came out of it's parent's listing,
+        # otherwise a session with a cold cache LISTs the parent too just to make sure top is a folder.
+        # Links to folders go in with the files so we don't walk in circles.
+        dirs = []
+        files = []
+        entries = {}
+        for entry in session._stat._listdir_stats(top,check_dir):
+            entries[entry._st_name] = entry
+            if entry.st_mode is not None and stat_module.S_ISDIR(entry.st_mode):
+                dirs.append(entry._st_name)
+            else:
+                files.append(entry._st_name)
+        return dirs,files,entries
+
+    def _pool_walk(self,top,sessions):
+        # Same tuples as FTPHost.walk, but up to sessions logged-in connections LIST folders at the same time (see utils.parallel_walk).
+        # On a high latency link most of a walk is waiting on the server.
+        # Names come out of the listing as unicode, same as FTPHost.walk does it.
+        top = ftputil.tool.as_unicode(top)
+        listdir = lambda session,dirpath: self._listdir(session,dirpath,dirpath == top)
+        connect = lambda: self._setup(self.host._copy())
+        for dirpath,dirs,files,entries in utils.parallel_walk(top,listdir,sessions,self.host.path.join,connect,lambda session: session.close()):
+            self._v_listing = (dirpath.rstrip('/'),entries)
+            yield dirpath,dirs,files
+
+    @property
+    def prune_dirs(self):
+        # Unix servers keep folder mtimes and link counts like a local disk does.  Windows style LIST output doesn't give us a link count
+        # and it's mtimes are only good to the minute.  MLSD mostly leaves out unix.nlink too, those folders just get listed every time.
+        return getattr(settings,'prune_dirs',True) and isinstance(self.host._stat._parser,ftputil.stat.UnixParser)
 
     #lets us access the storage
     @property
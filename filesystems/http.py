@@ -2,7 +2,7 @@
 
 import httplib, urlparse, urllib, socket
 import imp
-from BTrees import OOBTree
+from libramen import pathindex
 import persistent
 from BeautifulSoup import *
 import time
@@ -16,12 +16,15 @@ product = 'http'
 
 class filesystem(persistent.Persistent):
 
+    # walk() crawls links instead of a tree, so the scheduler can't split it up by directory.
+    splittable = False
+
     def __init__(self,host):
         self.scanned = []
         self.to_scan = []
         self.product = "http"
         # required
-        self.root = OOBTree.OOBTree()
+        self.root = pathindex.PathIndex()
 
         # Did we get a valid URL or not?
         if not host.startswith('http://'):
@@ -33,7 +36,7 @@ class filesystem(persistent.Persistent):
     
         self.host = self.s_url.netloc
         
-    def walk(self,path):
+    def walk(self,path,stat=None):
         # need to initialize here
         self.to_scan = [path]
         while len(self.to_scan) > 0:
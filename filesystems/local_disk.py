@@ -1,9 +1,19 @@
 #!/usr/bin/python
 import pdb,os
 import imp
-from BTrees import OOBTree
+from libramen import pathindex
+from libramen import utils
 import persistent
 
+# os.scandir is python 3.5+, on 2.7 it's the scandir module from pypi.  Neither is required.
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 # If you need additional settings/setup/passwords/whatever, you set them in a companion settings file found in the fs_settings folder.
 # If one wanted to use the settings from the settings file for Ramen itself, one would specify that file instead of one in fs_settings.
 settings = imp.load_source('settings','fs_settings/local_disk.py')
@@ -15,7 +25,7 @@ class filesystem(persistent.Persistent):
     def __init__(self,*args):
         self.product = "local_disk"
         # required
-        self.root = OOBTree.OOBTree()
+        self.root = pathindex.PathIndex()
         pass
 
     def stat(self,path):
@@ -25,6 +35,33 @@ class filesystem(persistent.Persistent):
         except:
             return None
 
+    def stat_many(self,dirpath,names):
+        entries = self._entries(dirpath)
+        stats = []
+        for name in names:
+            if name in entries:
+                # DirEntry caches this, so it's one stat per file at most.
+                try:
+                    stats.append(entries[name].stat())
+                except OSError:
+                    stats.append(None)
+            else:
+                stats.append(self.stat(os.path.join(dirpath,name)))
+        return stats
+
+    def _entries(self,dirpath):
+        # DirEntry objects for dirpath -- from the folder walk() just yielded if we can, otherwise one scandir pass.
+        # _v_ attributes are never saved by the ZODB.
+        listing = getattr(self,'_v_listing',None)
+        if listing is not None and listing[0] == os.path.normpath(dirpath):
+            return listing[1]
+        if scandir is None:
+            return {}
+        try:
+            return dict((entry.name,entry) for entry in scandir(dirpath))
+        except OSError:
+            return {}
+
     def is_dir(self,path):
         return os.path.isdir(path)
 
@@ -36,8 +73,82 @@ class filesystem(persistent.Persistent):
     def validate(self,target):
         return True
 
-    def walk(self,path):
-        return os.walk(path)
+    def walk(self,path,stat=None):
+        # stat doesn't buy us anything here, scandir doesn't care if we know it's a folder.
+        # Pseudo-filesystems (/proc, /sys, /dev by default) are never descended into.
+        skip = set(os.path.normpath(p) for p in getattr(settings,'skip_paths',[]))
+        if self.walk_threads:
+            return self._parallel_walk(path,skip,self.walk_threads)
+        return self._serial_walk(path,skip)
+
+    @property
+    def walk_threads(self):
+        return getattr(settings,'walk_threads',0)
+
+    @property
+    def prune_dirs(self):
+        # A folder's mtime changes whenever something in it is added, removed or renamed, so an incremental rescan can skip listing it.
+        return getattr(settings,'prune_dirs',True)
+
+    @property
+    def splittable(self):
+        # A parallel walk does the fanning out itself, so the scheduler hands it the whole tree as one job.
+        return not self.walk_threads
+
+    # Even as one job it's still a tree walk, the folders get checkpointed one at a time.
+    walks_tree = True
+
+    def _listdir(self,top,skip):
+        # Reads one folder -- returns (dirs, files, {name: DirEntry}).  d_type tells us what's a folder without a stat.
+        # Links to folders go in with the files so we don't walk in circles.
+        dirs = []
+        files = []
+        if scandir is None:
+            # No scandir -- listdir and lstat, no entries to hand to stat_many.
+            for name in os.listdir(top):
+                fullpath = os.path.join(top,name)
+                if not os.path.isdir(fullpath) or os.path.islink(fullpath):
+                    files.append(name)
+                elif fullpath not in skip:
+                    dirs.append(name)
+            return dirs,files,{}
+        entries = {}
+        for entry in scandir(top):
+            entries[entry.name] = entry
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.append(entry.name)
+            elif os.path.join(top,entry.name) not in skip:
+                dirs.append(entry.name)
+        return dirs,files,entries
+
+    def _serial_walk(self,top,skip):
+        # Yields the same (dirpath, dirs, files) tuples as os.walk, but each folder is read exactly once.
+        # The entries are kept around for stat_many.
+        if os.path.normpath(top) in skip:
+            return
+        try:
+            dirs,files,entries = self._listdir(top,skip)
+        except OSError:
+            return
+        self._v_listing = (os.path.normpath(top),entries)
+        yield top,dirs,files
+        for name in dirs:
+            for listing in self._serial_walk(os.path.join(top,name),skip):
+                yield listing
+
+    def _parallel_walk(self,top,skip,threads):
+        # Same tuples as _serial_walk, but the readdir calls are spread over a pool of threads (see utils.parallel_walk).
+        # Good for NFS/CIFS mounts (see utils.mount), where every listing is a network round trip.
+        if os.path.normpath(top) in skip:
+            return
+        listdir = lambda state,dirpath: self._listdir(dirpath,skip)
+        for dirpath,dirs,files,entries in utils.parallel_walk(top,listdir,threads,os.path.join):
+            self._v_listing = (os.path.normpath(dirpath),entries)
+            yield dirpath,dirs,files
 
     #lets us access the storage
     @property
@@ -141,6 +141,8 @@ class FTPFile(object):
         self.closed = True
         self._conn = None
         self._fobj = None
+        # Called with the host and how closing went, see `FTPHost.open`.
+        self._on_close = None
 
     def _open(self, path, mode, buffering=None, encoding=None, errors=None,
               newline=None):
@@ -270,6 +272,9 @@ class FTPFile(object):
         # Statement works only before the try/finally statement,
         # otherwise Python raises an `UnboundLocalError`.
         old_timeout = self._session.sock.gettimeout()
+        # How closing went, for `_on_close`: "clean", "ignored" if an
+        # error reply was ignored (see below) or "failed".
+        outcome = "failed"
         try:
             self._fobj.close()
             self._fobj = None
@@ -291,6 +296,9 @@ class FTPFile(object):
                 if exc.splitlines()[0] != "timed out" and \
                   error_code not in ("150", "426", "450", "451"):
                     raise
+                outcome = "ignored"
+            else:
+                outcome = "clean"
         finally:
             # Restore timeout for socket of `FTPFile`'s `ftplib.FTP`
             # object in case the connection is reused later.
@@ -300,3 +308,5 @@ class FTPFile(object):
             # either, so we consider the file closed for practical
             # purposes.
             self.closed = True
+            if self._on_close is not None:
+                self._on_close(self._host, outcome)
@@ -11,6 +11,7 @@ See `__init__.py` for an example.
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import collections
 import ftplib
 import stat
 import sys
@@ -82,8 +83,16 @@ class FTPHost(object):
         with ftputil.error.ftplib_error_to_ftp_os_error:
             self._cached_current_dir = \
               ftputil.tool.as_unicode(self._session.pwd())
+        # The directory the server is actually in. This may differ
+        # from `_cached_current_dir` after a listing if
+        # `listing_mode` isn't "chdir".
+        self._server_dir = self._cached_current_dir
         # Associated `FTPHost` objects for data transfer.
         self._children = []
+        # Children whose files are closed, as `(child, idle_since,
+        # trusted)` tuples, the most recently used last. Children
+        # which aren't `trusted` are always checked before reuse.
+        self._idle_children = collections.deque()
         # This is only set to something else than `None` if this
         # instance represents an `FTPFile`.
         self._file = None
@@ -99,6 +108,28 @@ class FTPHost(object):
         # Use `LIST -a` option by default. If this causes problems,
         # the user can set the attribute to `False`.
         self.use_list_a_option = True
+        # Use `MLSD` for directory listings if the server advertises
+        # it via `FEAT`. Set this to `False` to always use `LIST`.
+        self.use_mlsd = True
+        # Features from `FEAT`, requested on first use.
+        self._feature_set = None
+        # Child sessions (see `open`): keep at most this many idle
+        # children, close children idle for longer than
+        # `child_idle_timeout` seconds (`None` means never) and check
+        # with a `PWD` that a child is still alive if it has been idle
+        # for at least `child_check_interval` seconds.
+        self.max_idle_children = 10
+        self.child_idle_timeout = 60.0
+        self.child_check_interval = 0.0
+        # How to list directories (see `_robust_ftp_command`):
+        # - "chdir": change into the directory, list it and change
+        #   back (the whitespace workaround, three round trips)
+        # - "track": change into the directory and list it, but stay
+        #   there until the server has to be somewhere else
+        # - "direct": list the directory by its absolute path. If
+        #   the server turns out not to support this, switch to
+        #   "track" for this host.
+        self.listing_mode = "chdir"
 
     def keep_alive(self):
         """
@@ -147,30 +178,80 @@ class FTPHost(object):
         (`FTPHost` object) from the pool of children or `None` if
         there aren't any.
         """
-        #TODO: Currently timed-out child sessions aren't removed and
-        # may collect over time. In very busy or long running
-        # processes, this might slow down an application because the
-        # same stale child sessions have to be processed again and
-        # again.
-        for host in self._children:
-            # Test for timeouts only after testing for a closed file:
-            # - If a file isn't closed, save time; don't bother to access
-            #   the remote server.
-            # - If a file transfer on the child is in progress, requesting
-            #   the directory is an invalid operation because of the way
-            #   the FTP state machine works (see RFC 959).
-            if host._file.closed:
-                try:
-                    host._session.pwd()
-                # Timed-out sessions raise `error_temp`.
-                except ftplib.error_temp:
-                    continue
-                else:
-                    # Everything's ok; use this `FTPHost` instance.
-                    return host
+        self._reap_children()
+        while self._idle_children:
+            # The most recently used child is the least likely to
+            # have timed out.
+            host, idle_since, trusted = self._idle_children.pop()
+            if trusted and (time.time() - idle_since <
+                            self.child_check_interval):
+                return host
+            # Only idle children are in the pool, so requesting the
+            # directory can't interfere with a file transfer (see
+            # RFC 959).
+            try:
+                host._session.pwd()
+            # Timed-out sessions raise `error_temp`, broken connections
+            # something else.
+            except ftplib.all_errors:
+                self._discard_child(host)
+            else:
+                # Everything's ok; use this `FTPHost` instance.
+                return host
         # Be explicit.
         return None
 
+    def _release_child(self, host, trusted=True):
+        """
+        Put the child `host` whose file has just been closed back
+        into the pool of idle children. If `trusted` is false, check
+        the session before it's used again.
+        """
+        if self.closed or host.closed:
+            return
+        self._idle_children.append((host, time.time(), trusted))
+        self._reap_children()
+
+    def _child_file_closed(self, host, outcome):
+        """
+        Return the child `host` to the pool after its file was
+        closed. `outcome` says how closing went (see `FTPFile.close`).
+        """
+        if outcome == "clean":
+            self._release_child(host)
+        elif outcome == "ignored":
+            # The server didn't answer as expected, so make sure the
+            # session still works before it's used again.
+            self._release_child(host, trusted=False)
+        else:
+            # Who knows what state the control connection is in.
+            self._discard_child(host)
+
+    def _reap_children(self):
+        """
+        Close idle children beyond `max_idle_children` and those idle
+        for longer than `child_idle_timeout`, oldest first.
+        """
+        now = time.time()
+        while self._idle_children:
+            host, idle_since, _ = self._idle_children[0]
+            if (len(self._idle_children) <= self.max_idle_children and
+                (self.child_idle_timeout is None or
+                 now - idle_since <= self.child_idle_timeout)):
+                break
+            self._idle_children.popleft()
+            self._discard_child(host)
+
+    def _discard_child(self, host):
+        """Close the idle child `host` and forget about it."""
+        if host in self._children:
+            self._children.remove(host)
+        try:
+            host.close()
+        except (ftputil.error.FTPError,) + ftplib.all_errors:
+            # The session is probably dead already.
+            pass
+
     def open(self, path, mode="r", buffering=None, encoding=None, errors=None,
              newline=None):
         """
@@ -184,10 +265,13 @@ class FTPHost(object):
         # pylint: disable=too-many-arguments
         path = ftputil.tool.as_unicode(path)
         host = self._available_child()
-        if host is None:
+        reused = host is not None
+        if not reused:
             host = self._copy()
             self._children.append(host)
             host._file = ftputil.file.FTPFile(host)
+            # Put the child back into the pool when the file is closed.
+            host._file._on_close = self._child_file_closed
         basedir = self.getcwd()
         # Prepare for changing the directory (see whitespace workaround
         # in method `_dir`).
@@ -197,16 +281,26 @@ class FTPHost(object):
             effective_path = host.path.join(basedir, path)
         effective_dir, effective_file = host.path.split(effective_path)
         try:
-            # This will fail if the directory isn't accesible at all.
-            host.chdir(effective_dir)
-        except ftputil.error.PermanentError:
-            # Similarly to a failed `file` in a local file system,
-            # raise an `IOError`, not an `OSError`.
-            raise ftputil.error.FTPIOError("remote directory '{0}' doesn't "
-                    "exist or has insufficient access rights".
-                    format(effective_dir))
-        host._file._open(effective_file, mode=mode, buffering=buffering,
-                         encoding=encoding, errors=errors, newline=newline)
+            # A reused child may already be there from its last
+            # `chdir`; a new one has to check even its login directory.
+            if not reused or host.getcwd() != effective_dir:
+                try:
+                    # This will fail if the directory isn't accesible
+                    # at all.
+                    host.chdir(effective_dir)
+                except ftputil.error.PermanentError:
+                    # Similarly to a failed `file` in a local file
+                    # system, raise an `IOError`, not an `OSError`.
+                    raise ftputil.error.FTPIOError("remote directory '{0}' "
+                            "doesn't exist or has insufficient access rights".
+                            format(effective_dir))
+            host._file._open(effective_file, mode=mode, buffering=buffering,
+                             encoding=encoding, errors=errors, newline=newline)
+        except Exception:
+            # The file wasn't opened, so the child is still available,
+            # though maybe the session broke.
+            self._release_child(host, trusted=False)
+            raise
         if "w" in mode:
             # Invalidate cache entry because size and timestamps will change.
             self.stat_cache.invalidate(effective_path)
@@ -219,6 +313,8 @@ class FTPHost(object):
         # Close associated children.
         for host in self._children:
             # Children have a `_file` attribute which is an `FTPFile` object.
+            # Don't put it back into the pool on the way out.
+            host._file._on_close = None
             host._file.close()
             host.close()
         # Now deal with ourself.
@@ -232,6 +328,7 @@ class FTPHost(object):
             # practical purposes.
             self.stat_cache.clear()
             self._children = []
+            self._idle_children.clear()
             self.closed = True
 
     #
@@ -552,6 +649,9 @@ class FTPHost(object):
         If `descend_deeply` is true (the default is false), descend
         deeply, i. e. change the directory to the end of the path.
         """
+        # Listings don't need to get back to the current directory.
+        if descend_deeply and self.listing_mode != "chdir":
+            return self._listing_command(command, path)
         # If we can't change to the yet-current directory, the code
         # below won't work (see below), so in this case rather raise
         # an exception than giving wrong results.
@@ -581,6 +681,39 @@ class FTPHost(object):
         finally:
             self.chdir(old_dir)
 
+    def _listing_command(self, command, path):
+        """
+        Run the listing `command` on the directory `path` as
+        `listing_mode` says, with as few round trips as possible.
+        """
+        path = self.path.abspath(path)
+        # Paths with whitespace always take the workaround.
+        if self.listing_mode == "direct" and " " not in path:
+            try:
+                return command(self, path)
+            except ftputil.error.PermanentError:
+                # Either the directory isn't there or the server can't
+                # list by path. In the latter case, the workaround
+                # succeeds, so use it from now on.
+                result = self._command_in_directory(command, path)
+                self.listing_mode = "track"
+                return result
+        return self._command_in_directory(command, path)
+
+    def _command_in_directory(self, command, path):
+        """
+        Run `command` in the absolute directory `path`. Only change
+        the directory if the server isn't already there, and don't
+        change back; `chdir` and `_check_inaccessible_login_directory`
+        take care of that when needed.
+        """
+        if self._server_dir != path:
+            with ftputil.error.ftplib_error_to_ftp_os_error:
+                self._session.cwd(path)
+            self._server_dir = path
+        # Workaround for recursive listings, see `_robust_ftp_command`.
+        return command(self, "")
+
     #
     # Miscellaneous utility methods resembling functions in `os`
     #
@@ -591,12 +724,18 @@ class FTPHost(object):
     def chdir(self, path):
         """Change the directory on the host."""
         path = ftputil.tool.as_unicode(path)
-        with ftputil.error.ftplib_error_to_ftp_os_error:
-            self._session.cwd(path)
         # The path given as the argument is relative to the old current
         # directory, therefore join them.
-        self._cached_current_dir = \
+        new_dir = \
           self.path.normpath(self.path.join(self._cached_current_dir, path))
+        # If a listing left the server somewhere else, the path
+        # relative to the current directory won't do.
+        if self._server_dir != self._cached_current_dir:
+            path = new_dir
+        with ftputil.error.ftplib_error_to_ftp_os_error:
+            self._session.cwd(path)
+        self._cached_current_dir = new_dir
+        self._server_dir = new_dir
 
     # Ignore unused argument `mode`
     # pylint: disable=unused-argument
@@ -803,6 +942,46 @@ class FTPHost(object):
                                          descend_deeply=True)
         return lines
 
+    def _features(self):
+        """
+        Return a set of the (upper-case) feature names the server
+        lists in reply to `FEAT`, e. g. "MLST" or "UTF8". If the
+        server doesn't know `FEAT`, the set is empty.
+        """
+        if self._feature_set is None:
+            features = set()
+            try:
+                with ftputil.error.ftplib_error_to_ftp_os_error:
+                    response = self._session.sendcmd("FEAT")
+            except ftputil.error.PermanentError:
+                response = ""
+            # Feature lines are indented by a space, the first and
+            # last line hold the status code.
+            for line in response.splitlines():
+                if line.startswith(" ") and line.strip():
+                    features.add(line.split()[0].upper())
+            self._feature_set = features
+        return self._feature_set
+
+    def _mlsd(self, path):
+        """
+        Return a directory listing as made by FTP's `MLSD` command
+        (RFC 3659).
+        """
+        def _FTPHost_mlsd_command(self, path):
+            """Callback function."""
+            lines = []
+            def callback(line):
+                """Callback function."""
+                lines.append(ftputil.tool.as_unicode(line))
+            command = "MLSD {0}".format(path) if path else "MLSD"
+            with ftputil.error.ftplib_error_to_ftp_os_error:
+                self._session.retrlines(command, callback)
+            return lines
+        lines = self._robust_ftp_command(_FTPHost_mlsd_command, path,
+                                         descend_deeply=True)
+        return lines
+
     # The `listdir`, `lstat` and `stat` methods don't use
     # `_robust_ftp_command` because they implicitly already use
     # `_dir` which actually uses `_robust_ftp_command`.
@@ -851,36 +1030,85 @@ class FTPHost(object):
         path = ftputil.tool.as_unicode(path)
         return self._stat._stat(path, _exception_for_missing_path)
 
-    def walk(self, top, topdown=True, onerror=None):
+    def walk(self, top, topdown=True, onerror=None, stats=False,
+             check_dir=True):
         """
         Iterate over directory tree and return a tuple (dirpath,
         dirnames, filenames) on each iteration, like the `os.walk`
         function (see http://docs.python.org/lib/os-file-dir.html ).
+
+        If `stats` is true, return a tuple (dirpath, dirnames,
+        filenames, lstat_results) instead, where `lstat_results` maps
+        each name in `dirpath` to its `lstat` result.
+
+        Each directory is listed only once. Entries are classified by
+        the modes from the listing, so only links need more requests.
+        If `check_dir` is false, the caller already knows that `top`
+        is a directory (say, from the listing of its parent), so the
+        parent isn't listed to make sure.
         """
         top = ftputil.tool.as_unicode(top)
-        # The following code is copied from `os.walk` in Python 2.4
-        # and adapted to ftputil.
+        return self._walk(top, topdown, onerror, stats, check_dir)
+
+    def _walk(self, top, topdown, onerror, stats, check_dir):
+        """
+        Implementation of `walk`. If `check_dir` is false, `top` is
+        known to be a directory from the listing of its parent.
+        """
+        # Keep the listing of `top` in the stat cache until we're
+        # done with it. Otherwise, in directory mode, listing a big
+        # subdirectory might evict it, and stat'ing links and the
+        # subdirectories would list `top` again.
+        cache_path = self.path.abspath(top)
+        self.stat_cache.pin(cache_path)
         try:
-            names = self.listdir(top)
-        except ftputil.error.FTPOSError as err:
-            if onerror is not None:
-                onerror(err)
-            return
-        dirs, nondirs = [], []
-        for name in names:
-            if self.path.isdir(self.path.join(top, name)):
-                dirs.append(name)
+            # The following code is adapted from `os.walk` in Python
+            # 2.4, but takes the file types from the `lstat` results
+            # of the listing instead of calling `isdir` and `islink`
+            # for every name.
+            try:
+                stat_results = self._stat._listdir_stats(top, check_dir)
+            except ftputil.error.FTPOSError as err:
+                if onerror is not None:
+                    onerror(err)
+                return
+            dirs, nondirs, lstat_results = [], [], {}
+            for stat_result in stat_results:
+                name = stat_result._st_name
+                lstat_results[name] = stat_result
+                mode = stat_result.st_mode
+                if mode is None or stat.S_ISLNK(mode):
+                    # Like `os.walk`, put links to directories in
+                    # `dirs`. This needs the link target.
+                    is_dir = self.path.isdir(self.path.join(top, name))
+                else:
+                    is_dir = stat.S_ISDIR(mode)
+                if is_dir:
+                    dirs.append(name)
+                else:
+                    nondirs.append(name)
+            if stats:
+                result = top, dirs, nondirs, lstat_results
             else:
-                nondirs.append(name)
-        if topdown:
-            yield top, dirs, nondirs
-        for name in dirs:
-            path = self.path.join(top, name)
-            if not self.path.islink(path):
-                for item in self.walk(path, topdown, onerror):
-                    yield item
-        if not topdown:
-            yield top, dirs, nondirs
+                result = top, dirs, nondirs
+            if topdown:
+                yield result
+            # The caller may have changed `dirs`.
+            for name in dirs:
+                path = self.path.join(top, name)
+                mode = getattr(lstat_results.get(name), "st_mode", None)
+                if mode is not None:
+                    is_link = stat.S_ISLNK(mode)
+                else:
+                    is_link = self.path.islink(path)
+                if not is_link:
+                    for item in self._walk(path, topdown, onerror, stats,
+                                           name not in lstat_results):
+                        yield item
+            if not topdown:
+                yield result
+        finally:
+            self.stat_cache.unpin(cache_path)
 
     def chmod(self, path, mode):
         """
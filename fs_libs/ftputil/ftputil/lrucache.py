@@ -49,7 +49,7 @@ import time
 
 # The suffix after the hyphen denotes modifications by the
 # ftputil project with respect to the original version.
-__version__ = "0.2-12"
+__version__ = "0.2-13"
 __all__ = ['CacheKeyError', 'LRUCache', 'DEFAULT_SIZE']
 __docformat__ = 'reStructuredText en'
 
@@ -114,28 +114,6 @@ class LRUCache(object):
         print j, cache[j] # iterator produces keys, not values
     """
 
-#    class _Node(object):
-#        """Record of a cached value. Not for public consumption."""
-#
-#        def __init__(self, key, obj, timestamp, sort_key):
-#            object.__init__(self)
-#            self.key = key
-#            self.obj = obj
-#            self.atime = timestamp
-#            self.mtime = self.atime
-#            self._sort_key = sort_key
-#
-#        def __lt__(self, other):
-#            # Seems to be preferred over `__cmp__`, at least in newer
-#            # Python versions. Uses only around 60 % of the time
-#            # with respect to `__cmp__`.
-#            return self._sort_key < other._sort_key
-#
-#        def __repr__(self):
-#            return "<%s %s => %s (%s)>" % \
-#                   (self.__class__, self.key, self.obj, \
-#                    time.asctime(time.localtime(self.atime)))
-
     def __init__(self, size=DEFAULT_SIZE):
         """Init the `LRUCache` object. `size` is the initial
         _maximum_ size of the cache. The size can be changed by
@@ -153,21 +131,32 @@ class LRUCache(object):
         The `size` attribute of the cache isn't modified.
         """
         # pylint: disable=attribute-defined-outside-init
-        self.__heap = []
+        #
+        # The nodes form a circular doubly linked list, ordered from
+        # the least to the most recently used one. `__root` is a
+        # sentinel; `__root.next` is the least recently used node,
+        # `__root.prev` the most recently used. With the dictionary
+        # for the lookup, all operations on single items are O(1).
+        self.__root = _Node(None, None, None)
+        self.__root.prev = self.__root.next = self.__root
         self.__dict = {}
-        self.__counter = 0
 
-    def _sort_key(self):
-        """Return a new integer value upon every call.
+    def __unlink(self, node):
+        """Remove `node` from the linked list."""
+        node.prev.next = node.next
+        node.next.prev = node.prev
 
-        Cache nodes need a monotonically increasing time indicator.
-        `time.time()` and `time.clock()` don't guarantee this in a
-        platform-independent way.
+    def __append(self, node):
+        """Insert `node` as the most recently used node."""
+        root = self.__root
+        last = root.prev
+        node.prev, node.next = last, root
+        last.next = root.prev = node
 
-        See http://ftputil.sschwarzer.net/trac/ticket/32 for details.
-        """
-        self.__counter += 1
-        return self.__counter
+    def __touch(self, node):
+        """Make `node` the most recently used node."""
+        self.__unlink(node)
+        self.__append(node)
 
     def __len__(self):
         """Return _current_ number of cache entries.
@@ -175,7 +164,7 @@ class LRUCache(object):
         This may be different from the value of the `size`
         attribute.
         """
-        return len(self.__heap)
+        return len(self.__dict)
 
     def __contains__(self, key):
         """Return `True` if the item denoted by `key` is in the cache."""
@@ -188,7 +177,6 @@ class LRUCache(object):
         would exceed the maximum cache size, the least recently
         used item in the cache is "forgotten".
         """
-        heap = self.__heap
         dict_ = self.__dict
         if key in dict_:
             node = dict_[key]
@@ -196,19 +184,19 @@ class LRUCache(object):
             node.obj = obj
             node.atime = time.time()
             node.mtime = node.atime
-            node._sort_key = self._sort_key()
+            self.__touch(node)
         else:
-            # The size of the heap can be at most the value of
+            # The size of the cache can be at most the value of
             # `self.size` because `__setattr__` decreases the cache
             # size if the new size value is smaller; so we don't
             # need a loop _here_.
-            if len(heap) == self.size:
-                lru_node = min(heap)
-                heap.remove(lru_node)
+            if len(dict_) == self.size:
+                lru_node = self.__root.next
+                self.__unlink(lru_node)
                 del dict_[lru_node.key]
-            node = _Node(key, obj, time.time(), self._sort_key())
+            node = _Node(key, obj, time.time())
             dict_[key] = node
-            heap.append(node)
+            self.__append(node)
 
     def __getitem__(self, key):
         """Return the item stored under `key` key.
@@ -222,7 +210,7 @@ class LRUCache(object):
             node = self.__dict[key]
             # Update node object in-place.
             node.atime = time.time()
-            node._sort_key = self._sort_key()
+            self.__touch(node)
             return node.obj
 
     def __delitem__(self, key):
@@ -234,45 +222,47 @@ class LRUCache(object):
         if not key in self.__dict:
             raise CacheKeyError(key)
         else:
-            node = self.__dict[key]
-            self.__heap.remove(node)
-            del self.__dict[key]
+            node = self.__dict.pop(key)
+            self.__unlink(node)
             return node.obj
 
     def __iter__(self):
         """Iterate over the cache, from the least to the most
         recently accessed item.
         """
-        self.__heap.sort()
-        for node in self.__heap:
-            yield node.key
+        # Take a snapshot of the keys, so accessing items while
+        # iterating doesn't change the order we're walking.
+        keys = []
+        root = self.__root
+        node = root.next
+        while node is not root:
+            keys.append(node.key)
+            node = node.next
+        for key in keys:
+            yield key
 
     def __setattr__(self, name, value):
         """If the name of the attribute is "size", set the
         _maximum_ size of the cache to the supplied value.
         """
         object.__setattr__(self, name, value)
-        # Automagically shrink heap on resize.
+        # Automagically shrink cache on resize.
         if name == 'size':
             size = value
             if not isinstance(size, int_types):
                 raise TypeError("cache size (%r) must be an integer" % size)
             if size <= 0:
                 raise ValueError("cache size (%d) must be positive" % size)
-            heap = self.__heap
             dict_ = self.__dict
-            # Do we need to remove anything at all?
-            if len(heap) <= self.size:
-                return
-            # Remove enough nodes to reach the new size.
-            heap.sort()
-            node_count_to_remove = len(heap) - self.size
-            for node in heap[:node_count_to_remove]:
-                del dict_[node.key]
-            del heap[:node_count_to_remove]
+            # Remove least recently used nodes until we reach the
+            # new size (if necessary at all).
+            while len(dict_) > self.size:
+                lru_node = self.__root.next
+                self.__unlink(lru_node)
+                del dict_[lru_node.key]
 
     def __repr__(self):
-        return "<%s (%d elements)>" % (str(self.__class__), len(self.__heap))
+        return "<%s (%d elements)>" % (str(self.__class__), len(self.__dict))
 
     def mtime(self, key):
         """Return the last modification time for the cache record with key.
@@ -289,19 +279,17 @@ class LRUCache(object):
 class _Node(object):
     """Record of a cached value. Not for public consumption."""
 
-    def __init__(self, key, obj, timestamp, sort_key):
+    __slots__ = ("key", "obj", "atime", "mtime", "prev", "next")
+
+    def __init__(self, key, obj, timestamp):
         object.__init__(self)
         self.key = key
         self.obj = obj
         self.atime = timestamp
         self.mtime = self.atime
-        self._sort_key = sort_key
-
-    def __lt__(self, other):
-        # Seems to be preferred over `__cmp__`, at least in newer
-        # Python versions. Uses only around 60 % of the time
-        # with respect to `__cmp__`.
-        return self._sort_key < other._sort_key
+        # Neighbors in the cache's linked list
+        self.prev = None
+        self.next = None
 
     def __repr__(self):
         return "<%s %s => %s (%s)>" % \
@@ -8,6 +8,7 @@ ftputil.stat - stat result, parsers, and FTP stat'ing for `ftputil`
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import calendar
 import math
 import re
 import stat
@@ -18,7 +19,7 @@ import ftputil.stat_cache
 
 
 # These can be used to write custom parsers.
-__all__ = ["StatResult", "Parser", "UnixParser", "MSParser"]
+__all__ = ["StatResult", "Parser", "UnixParser", "MSParser", "MLSDParser"]
 
 
 class StatResult(tuple):
@@ -425,6 +426,147 @@ class MSParser(Parser):
         stat_result._st_mtime_precision = 60
         return stat_result
 
+class MLSDParser(Parser):
+    """
+    `Parser` class for the machine-readable listings of the `MLSD`
+    command (RFC 3659).
+
+    Unlike `LIST` output, the format is standardized, so there's no
+    guessing of the year or the listing style, and timestamps are
+    precise to the second (or better).
+    """
+
+    _type_to_mode = {"file": stat.S_IFREG, "dir": stat.S_IFDIR,
+                     "cdir": stat.S_IFDIR, "pdir": stat.S_IFDIR}
+
+    @staticmethod
+    def _split_line(line):
+        """
+        Split a line into a dictionary of facts (with lower-case fact
+        names) and the file name. The facts are separated from the
+        name by a single space.
+        """
+        try:
+            fact_string, name = line.split(" ", 1)
+        except ValueError:
+            raise ftputil.error.ParserError("line '{0}' can't be parsed".
+                                            format(line))
+        facts = {}
+        for fact in fact_string.split(";"):
+            if not fact:
+                continue
+            fact_name, sep, value = fact.partition("=")
+            if not sep:
+                raise ftputil.error.ParserError("invalid fact '{0}'".
+                                                format(fact))
+            facts[fact_name.lower()] = value
+        if not name:
+            raise ftputil.error.ParserError("line '{0}' has no name".
+                                            format(line))
+        return facts, name
+
+    def ignores_line(self, line):
+        """
+        Ignore empty lines and the entries for the listed directory
+        itself and its parent.
+        """
+        if not line.strip():
+            return True
+        try:
+            facts, _ = self._split_line(line)
+        except ftputil.error.ParserError:
+            return False
+        return facts.get("type", "").lower() in ("cdir", "pdir")
+
+    def parse_modify_time(self, value, time_shift):
+        """
+        Return a floating point number for the `modify` fact value
+        `value`, formatted "YYYYMMDDHHMMSS[.sss]" in UTC.
+
+        To be consistent with the `LIST` parsers, the result is in
+        server time, i. e. `time_shift` is added.
+        """
+        # Derived classes might want to use `self`.
+        # pylint: disable=no-self-use
+        seconds, _, fraction = value.partition(".")
+        try:
+            time_tuple = time.strptime(seconds, "%Y%m%d%H%M%S")
+            st_mtime = calendar.timegm(time_tuple)
+            if fraction:
+                st_mtime += float("0." + fraction)
+        except ValueError:
+            raise ftputil.error.ParserError("invalid time string '{0}'".
+                                            format(value))
+        return st_mtime + time_shift
+
+    def parse_line(self, line, time_shift=0.0):
+        """
+        Return a `StatResult` instance corresponding to the given
+        `MLSD` line.
+
+        If the line can't be parsed, raise a `ParserError`.
+        """
+        facts, name = self._split_line(line)
+        # st_mode
+        type_ = facts.get("type", "").lower()
+        st_target = None
+        if type_ in self._type_to_mode:
+            st_mode = self._type_to_mode[type_]
+        elif type_.startswith("os.unix=slink") or \
+             type_.startswith("os.unix=symlink"):
+            st_mode = stat.S_IFLNK
+            # Take the target from the original value to keep its case.
+            _, _, st_target = facts["type"].partition(":")
+            st_target = st_target or None
+        else:
+            raise ftputil.error.ParserError("unknown type fact '{0}'".
+                                            format(facts.get("type")))
+        if "unix.mode" in facts:
+            try:
+                st_mode = st_mode | int(facts["unix.mode"], 8)
+            except ValueError:
+                raise ftputil.error.ParserError("invalid mode '{0}'".
+                                                format(facts["unix.mode"]))
+        else:
+            # Like for the MS format, assume read access; the `perm`
+            # fact tells us about writing.
+            st_mode = st_mode | 0o400
+            if set(facts.get("perm", "").lower()) & set("acdfmw"):
+                st_mode = st_mode | 0o200
+        # st_ino, st_dev, st_nlink, st_uid, st_gid, st_size, st_atime
+        st_ino = None
+        st_dev = None
+        try:
+            st_nlink = int(facts["unix.nlink"]) if "unix.nlink" in facts \
+                       else None
+            size = facts.get("size", facts.get("sizd"))
+            st_size = int(size) if size is not None else None
+        except ValueError:
+            raise ftputil.error.ParserError("invalid number in line '{0}'".
+                                            format(line))
+        st_uid = facts.get("unix.owner", facts.get("unix.uid"))
+        st_gid = facts.get("unix.group", facts.get("unix.gid"))
+        st_atime = None
+        # st_mtime
+        if "modify" in facts:
+            st_mtime = self.parse_modify_time(facts["modify"], time_shift)
+            st_mtime_precision = 1
+        else:
+            st_mtime = None
+            st_mtime_precision = None
+        # st_ctime
+        st_ctime = None
+        stat_result = StatResult(
+                      (st_mode, st_ino, st_dev, st_nlink, st_uid,
+                       st_gid, st_size, st_atime, st_mtime, st_ctime) )
+        # These attributes are kind of "half-official". I'm not
+        # sure whether they should be used by ftputil client code.
+        # pylint: disable=protected-access
+        stat_result._st_mtime_precision = st_mtime_precision
+        stat_result._st_name = name
+        stat_result._st_target = st_target
+        return stat_result
+
 #
 # Stat'ing operations for files on an FTP server
 #
@@ -441,6 +583,10 @@ class _Stat(object):
         self._allow_parser_switching = True
         # Cache only lstat results. `stat` works locally on `lstat` results.
         self._lstat_cache = ftputil.stat_cache.StatCache()
+        # Whether to use `MLSD` instead of `LIST`. `None` means we
+        # haven't asked the server yet.
+        self._use_mlsd = None
+        self._mlsd_parser = MLSDParser()
 
     def _host_dir(self, path):
         """
@@ -449,36 +595,86 @@ class _Stat(object):
         """
         return self._host._dir(path)
 
+    def _mlsd_supported(self):
+        """
+        Return a true value if directories should be listed with
+        `MLSD`. The first call asks the server via `FEAT`.
+        """
+        if self._use_mlsd is None:
+            self._use_mlsd = bool(getattr(self._host, "use_mlsd", False) and
+                                  "MLST" in self._host._features())
+        return self._use_mlsd
+
+    def _mlsd_stat_results(self, path):
+        """
+        Return a list of stat results from an `MLSD` listing of
+        `path`, or `None` if the server turned out not to support
+        `MLSD` after all. In that case, `LIST` is used from now on.
+        """
+        try:
+            lines = self._host._mlsd(path)
+            return [self._mlsd_parser.parse_line(line,
+                                                 self._host.time_shift())
+                    for line in lines
+                    if not self._mlsd_parser.ignores_line(line)]
+        except ftputil.error.PermanentError as exc:
+            # "Command not understood/implemented"; any other error
+            # (e. g. 550 for a missing directory) is for the caller.
+            if exc.errno not in (500, 501, 502, 504):
+                raise
+        except ftputil.error.ParserError:
+            pass
+        self._use_mlsd = False
+        return None
+
     def _stat_results_from_dir(self, path):
         """
         Yield stat results extracted from the directory listing `path`.
         Omit the special entries for the directory itself and its parent
         directory.
         """
+        if self._mlsd_supported():
+            stat_results = self._mlsd_stat_results(path)
+            if stat_results is not None:
+                for stat_result in self._cached(path, stat_results):
+                    yield stat_result
+                return
         lines = self._host_dir(path)
-        # `cache` is the "high-level" `StatCache` object whereas
-        # `cache._cache` is the "low-level" `LRUCache` object.
-        cache = self._lstat_cache
-        # Auto-grow cache if the cache up to now can't hold as many
-        # entries as there are in the directory `path`.
-        if cache._enabled and len(lines) >= cache._cache.size:
-            new_size = int(math.ceil(1.1 * len(lines)))
-            cache.resize(new_size)
-        # Yield stat results from lines.
+        stat_results = []
         for line in lines:
             if self._parser.ignores_line(line):
                 continue
             # For `listdir`, we are interested in just the names,
             # but we use the `time_shift` parameter to have the
             # correct timestamp values in the cache.
-            stat_result = self._parser.parse_line(line,
-                                                  self._host.time_shift())
-            if stat_result._st_name in [self._host.curdir, self._host.pardir]:
-                continue
-            loop_path = self._path.join(path, stat_result._st_name)
-            self._lstat_cache[loop_path] = stat_result
+            stat_results.append(self._parser.parse_line(
+                                  line, self._host.time_shift()))
+        for stat_result in self._cached(path, stat_results):
             yield stat_result
 
+    def _cached(self, path, stat_results):
+        """
+        Put the already parsed `stat_results` for the directory `path`
+        into the cache and return them, without the entries for the
+        directory itself and its parent directory.
+        """
+        stat_results = [stat_result for stat_result in stat_results
+                        if stat_result._st_name not in
+                          [self._host.curdir, self._host.pardir]]
+        # `cache` is the "high-level" `StatCache` object whereas
+        # `cache._cache` is the "low-level" `LRUCache` object.
+        cache = self._lstat_cache
+        # Auto-grow cache if the cache up to now can't hold as many
+        # entries as there are in the directory `path`. In directory
+        # mode, the listing is stored as a whole anyway.
+        if (cache._enabled and not cache.by_directory and
+            len(stat_results) >= cache._cache.size):
+            new_size = int(math.ceil(1.1 * len(stat_results)))
+            cache.resize(new_size)
+        cache.set_directory(path, dict((stat_result._st_name, stat_result)
+                                       for stat_result in stat_results))
+        return stat_results
+
     def _real_listdir(self, path):
         """
         Return a list of directories, files etc. in the directory
@@ -504,6 +700,22 @@ class _Stat(object):
             names.append(st_name)
         return names
 
+    def _real_listdir_stats(self, path, _check_dir=True):
+        """
+        Return a list of `lstat` results for the entries of the
+        directory named `path`, from a single directory listing.
+
+        If `_check_dir` is false, the caller already knows that
+        `path` is a directory, so don't list the parent directory
+        to make sure.
+        """
+        path = self._path.abspath(path)
+        if _check_dir and not self._path.isdir(path):
+            raise ftputil.error.PermanentError(
+                  "550 {0}: no such directory or wrong directory parser used".
+                  format(path))
+        return list(self._stat_results_from_dir(path))
+
     def _real_lstat(self, path, _exception_for_missing_path=True):
         """
         Return an object similar to that returned by `os.lstat`.
@@ -618,7 +830,8 @@ class _Stat(object):
             result = method(*args, **kwargs)
             # If a `listdir` call didn't find anything, we can't
             # say anything about the usefulness of the parser.
-            if (method is not self._real_listdir) and result:
+            if (method not in (self._real_listdir, self._real_listdir_stats)
+                and result):
                 self._allow_parser_switching = False
             return result
         except ftputil.error.ParserError:
@@ -641,6 +854,18 @@ class _Stat(object):
         """
         return self.__call_with_parser_retry(self._real_listdir, path)
 
+    def _listdir_stats(self, path, _check_dir=True):
+        """
+        Return a list of `StatResult`s for the items in `path`, as
+        `lstat` would return them.
+
+        Raise a `PermanentError` if the path doesn't exist, but
+        maybe raise other exceptions depending on the state of
+        the server (e. g. timeout).
+        """
+        return self.__call_with_parser_retry(self._real_listdir_stats, path,
+                                             _check_dir)
+
     def _lstat(self, path, _exception_for_missing_path=True):
         """
         Return a `StatResult` without following links.
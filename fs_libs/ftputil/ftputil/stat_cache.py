@@ -7,6 +7,7 @@ ftp_stat_cache.py - cache for (l)stat data
 
 from __future__ import unicode_literals
 
+import posixpath
 import time
 
 import ftputil.error
@@ -35,6 +36,12 @@ class StatCache(object):
 
     Note that the `__len__` method does no age tests and thus may
     include some or many already expired entries.
+
+    If `by_directory` is set to a true value, a directory listing is
+    stored as one unit, keyed by the directory, instead of entry by
+    entry. A big listing then can't push out single entries of
+    another directory, and a directory can be protected from being
+    evicted with `pin` while it's still needed (see `FTPHost.walk`).
     """
 
     # Disable "Badly implemented container" warning because of
@@ -43,10 +50,22 @@ class StatCache(object):
 
     # Default number of cache entries
     _DEFAULT_CACHE_SIZE = 5000
+    # Default number of directory listings in directory mode
+    _DEFAULT_DIRECTORY_CACHE_SIZE = 500
 
     def __init__(self):
         # Can be reset with method `resize`
         self._cache = ftputil.lrucache.LRUCache(self._DEFAULT_CACHE_SIZE)
+        # Directory listings, `{name: stat_result}` per directory.
+        # Can be reset with method `resize_directories`
+        self._directories = ftputil.lrucache.LRUCache(
+                              self._DEFAULT_DIRECTORY_CACHE_SIZE)
+        # Pinned directories. Map the directory path to a list
+        # `[pin count, entries, time of storage]`. `entries` is
+        # `None` as long as the listing hasn't been stored.
+        self._pinned = {}
+        # Store listings per directory (see class docstring)
+        self.by_directory = False
         # Never expire
         self.max_age = None
         self.enable()
@@ -76,6 +95,14 @@ class StatCache(object):
         """
         self._cache.size = new_size
 
+    def resize_directories(self, new_size):
+        """
+        Set the number of directory listings kept in directory mode
+        to the integer `new_size`. Pinned directories are kept even
+        if they're pushed out of the cache.
+        """
+        self._directories.size = new_size
+
     def _age(self, path):
         """
         Return the age of a cache entry for `path` in seconds. If
@@ -90,6 +117,10 @@ class StatCache(object):
     def clear(self):
         """Clear (invalidate) all cache entries."""
         self._cache.clear()
+        self._directories.clear()
+        # Keep the pins, the walker will unpin them.
+        for pin in self._pinned.values():
+            pin[1] = pin[2] = None
 
     def invalidate(self, path):
         """
@@ -110,6 +141,96 @@ class StatCache(object):
         except ftputil.lrucache.CacheKeyError:
             # Ignore errors
             pass
+        # The listing of `path` itself may be outdated now, too.
+        self._forget_directory(path)
+        dirname, basename = posixpath.split(path)
+        try:
+            entries = self._listing(dirname)
+        except ftputil.error.CacheMissError:
+            return
+        entries.pop(basename, None)
+
+    def pin(self, path):
+        """
+        Keep the listing of the directory `path` in the cache until
+        `unpin` is called as often as `pin`, no matter how many other
+        listings are stored meanwhile. `path` needn't be listed yet.
+
+        Pins only have an effect in directory mode.
+        """
+        assert path.startswith("/")
+        if path not in self._pinned:
+            pin = [0, None, None]
+            try:
+                pin[1] = self._directories[path]
+                pin[2] = self._directories.mtime(path)
+            except ftputil.lrucache.CacheKeyError:
+                pass
+            self._pinned[path] = pin
+        self._pinned[path][0] += 1
+
+    def unpin(self, path):
+        """Undo a `pin` call for the directory `path`."""
+        pin = self._pinned.get(path)
+        if pin is None:
+            return
+        pin[0] -= 1
+        if pin[0] <= 0:
+            # If the listing is still in `_directories`, it stays there.
+            del self._pinned[path]
+
+    def set_directory(self, path, entries):
+        """
+        Store the stat results of the directory `path`, given as a
+        dictionary `{name: stat_result}`.
+
+        In directory mode, the dictionary is stored as one unit.
+        Otherwise, the entries are stored one by one, as if set with
+        `__setitem__`.
+        """
+        assert path.startswith("/")
+        if not self._enabled:
+            return
+        if not self.by_directory:
+            for name, stat_result in entries.items():
+                self[posixpath.join(path, name)] = stat_result
+            return
+        self._directories[path] = entries
+        if path in self._pinned:
+            self._pinned[path][1:] = [entries, self._directories.mtime(path)]
+
+    def _forget_directory(self, path):
+        """Remove the listing of the directory `path` if present."""
+        try:
+            del self._directories[path]
+        except ftputil.lrucache.CacheKeyError:
+            pass
+        if path in self._pinned:
+            self._pinned[path][1:] = [None, None]
+
+    def _listing(self, path):
+        """
+        Return the stored entries of the directory `path`. If there
+        are none or they expired, raise a `CacheMissError`.
+        """
+        pin = self._pinned.get(path)
+        if pin is not None and pin[1] is not None:
+            entries, mtime = pin[1], pin[2]
+            # Keep it recently used for when it's unpinned.
+            if path in self._directories:
+                self._directories[path]
+        else:
+            try:
+                entries = self._directories[path]
+                mtime = self._directories.mtime(path)
+            except ftputil.lrucache.CacheKeyError:
+                raise ftputil.error.CacheMissError(
+                        "no listing for directory {0} in cache".format(path))
+        if (self.max_age is not None) and (time.time() - mtime > self.max_age):
+            self._forget_directory(path)
+            raise ftputil.error.CacheMissError(
+                    "listing for directory {0} has expired".format(path))
+        return entries
 
     def __getitem__(self, path):
         """
@@ -118,6 +239,16 @@ class StatCache(object):
         """
         if not self._enabled:
             raise ftputil.error.CacheMissError("cache is disabled")
+        if self.by_directory:
+            dirname, basename = posixpath.split(path)
+            try:
+                entries = self._listing(dirname)
+            except ftputil.error.CacheMissError:
+                # Maybe stored with `__setitem__`
+                pass
+            else:
+                if basename in entries:
+                    return entries[basename]
         # Possibly raise a `CacheMissError` in `_age`
         if (self.max_age is not None) and (self._age(path) > self.max_age):
             self.invalidate(path)
@@ -163,11 +294,24 @@ class StatCache(object):
         Return the number of entries in the cache. Note that this
         may include some (or many) expired entries.
         """
-        return len(self._cache)
+        return len(self._cache) + len(self._directory_paths())
+
+    def _directory_paths(self):
+        """Return the paths of the entries in directory listings."""
+        paths = set()
+        directories = dict((path, pin[1])
+                           for path, pin in self._pinned.items()
+                           if pin[1] is not None)
+        for path in self._directories:
+            directories[path] = self._directories[path]
+        for path, entries in directories.items():
+            for name in entries:
+                paths.add(posixpath.join(path, name))
+        return paths
 
     def __str__(self):
         """Return a string representation of the cache contents."""
         lines = []
-        for key in sorted(self._cache):
+        for key in sorted(set(self._cache) | self._directory_paths()):
             lines.append("{0}: {1}".format(key, self[key]))
         return "\n".join(lines)
@@ -105,6 +105,13 @@ class MockSession(object):
     # File content to be used (indirectly) with `transfercmd`.
     mock_file_content = b""
 
+    # Feature lines for the `FEAT` command. `None` means the server
+    # doesn't understand `FEAT`.
+    features = None
+
+    # Used by `MockSession.retrlines` for `MLSD`, like `dir_contents`.
+    mlsd_contents = {}
+
     def __init__(self, host="", user="", password=""):
         self.closed = 0
         # Copy default from class.
@@ -173,6 +180,35 @@ class MockSession(object):
             else:
                 callback(line)
 
+    def sendcmd(self, cmd):
+        if DEBUG:
+            print(cmd)
+        if cmd == "FEAT" and self.features is not None:
+            lines = ["211-Features:"]
+            lines.extend(" " + feature for feature in self.features)
+            lines.append("211 End")
+            return "\n".join(lines)
+        raise ftplib.error_perm("500 command not understood")
+
+    def retrlines(self, cmd, callback=None):
+        """
+        Provide the lines of an `MLSD` listing, much like `dir` does
+        for `LIST`.
+        """
+        if DEBUG:
+            print(cmd)
+        command, _, path = cmd.partition(" ")
+        if command != "MLSD" or not self.mlsd_contents:
+            raise ftplib.error_perm("500 command not understood")
+        path = self._transform_path(path)
+        if path not in self.mlsd_contents:
+            raise ftplib.error_perm("550 no such directory")
+        for line in self.mlsd_contents[path].split("\n"):
+            if callback is None:
+                print(line)
+            else:
+                callback(line)
+
     def voidresp(self):
         assert self._transfercmds == 1
         self._transfercmds -= 1
@@ -282,3 +318,37 @@ class MockMSFormatSession(MockSession):
 
       "/home/msformat/XPLaunch/empty": "total 0",
     }
+
+
+class MockMLSDFormatSession(MockUnixFormatSession):
+
+    features = ["MLST type*;size*;modify*;perm*;unix.mode*;", "UTF8"]
+
+    mlsd_contents = {
+      "/": """\
+type=cdir;modify=20000504120000;unix.mode=0755; /
+type=dir;modify=20000504120000;unix.mode=0755; home""",
+
+      "/home": """\
+type=cdir;modify=20000504120000;unix.mode=0755; .
+type=pdir;modify=20000504120000;unix.mode=0755; ..
+type=dir;modify=20000504120000;unix.mode=2755;unix.owner=45854;unix.group=200; sschwarzer
+type=file;size=4605;modify=19700119000000;unix.mode=0644;unix.owner=45854;unix.group=200; older
+type=file;size=4605;modify=20200119123456.789;unix.mode=0644;unix.owner=45854;unix.group=200; newer
+type=OS.unix=slink:sschwarzer/index.html;modify=20020119000000;unix.mode=0777; link
+type=dir;modify=20000504120000;perm=elc; dir with spaces""",
+
+      "/home/sschwarzer": """\
+type=file;size=4604;modify=20130119231100;perm=r; index.html""",
+
+      "/home/dir with spaces": """\
+type=file;size=4604;modify=20130119231100;unix.mode=0644; file with spaces""",
+    }
+
+
+class MockMLSDNotImplementedSession(MockUnixFormatSession):
+    """
+    Mock session for a server which advertises `MLST` but fails
+    on `MLSD` anyway.
+    """
+    features = ["MLST type*;size*;modify*;"]
@@ -4,6 +4,7 @@
 from __future__ import unicode_literals
 
 import ftplib
+import time
 import unittest
 
 import ftputil.compat
@@ -82,6 +83,110 @@ class TestFileOperations(unittest.TestCase):
         file2.close()
         self.assertTrue(child2._file.closed)
 
+    def test_max_idle_children(self):
+        host = test_base.ftp_host_factory()
+        host.max_idle_children = 1
+        files = [host.open("path{0:d}".format(i), "w") for i in range(3)]
+        children = list(host._children)
+        for file_ in files:
+            file_.close()
+        # Only the most recently used child is kept.
+        self.assertEqual(host._children, [children[2]])
+        self.assertTrue(children[0].closed)
+        self.assertTrue(host.open("path", "w")._host is children[2])
+
+    def test_idle_timeout(self):
+        host = test_base.ftp_host_factory()
+        host.child_idle_timeout = 0.0
+        file1 = host.open("path1", "w")
+        file1.close()
+        time.sleep(0.01)
+        file2 = host.open("path2", "w")
+        self.assertTrue(file2._host is not file1._host)
+        self.assertTrue(file1._host.closed)
+        self.assertEqual(host._children, [file2._host])
+
+    def test_timed_out_child(self):
+        host = test_base.ftp_host_factory()
+        file1 = host.open("path1", "w")
+        file1.close()
+        # Simulate an FTP server timeout.
+        def timed_out_pwd():
+            raise ftplib.error_temp("simulated timeout")
+        file1._host._session.pwd = timed_out_pwd
+        file2 = host.open("path2", "w")
+        self.assertTrue(file2._host is not file1._host)
+        self.assertEqual(host._children, [file2._host])
+
+    def test_check_interval(self):
+        """Recently used children are reused without a check."""
+        host = test_base.ftp_host_factory()
+        host.child_check_interval = 60.0
+        file1 = host.open("path1", "w")
+        file1.close()
+        def failing_pwd():
+            raise ftplib.error_temp("shouldn't be called")
+        file1._host._session.pwd = failing_pwd
+        self.assertTrue(host.open("path2", "w")._host is file1._host)
+
+    def test_failed_open_keeps_child(self):
+        host = test_base.ftp_host_factory()
+        host.child_check_interval = 60.0
+        self.assertRaises(ftputil.error.FTPIOError, host.open, "notthere")
+        self.assertEqual(len(host._children), 1)
+        # Reused, but checked first since the session may be broken.
+        child, _, trusted = host._idle_children[0]
+        self.assertFalse(trusted)
+        self.assertTrue(host.open("path", "w")._host is child)
+
+    def test_close_with_idle_children(self):
+        host = test_base.ftp_host_factory()
+        children = [host.open("path{0:d}".format(i), "w")._host
+                    for i in range(2)]
+        children[0]._file.close()
+        host.close()
+        self.assertTrue(children[0].closed)
+        self.assertTrue(children[1].closed)
+        self.assertEqual(len(host._idle_children), 0)
+
+    def _failing_voidresp(self, file_, message, exception=ftplib.error_temp):
+        """Let the final response of the transfer on `file_` fail."""
+        session = file_._session
+        def voidresp():
+            session._transfercmds -= 1
+            raise exception(message)
+        session.voidresp = voidresp
+
+    def test_close_with_ignored_error(self):
+        """A child whose close ignored an error is checked before reuse."""
+        host = test_base.ftp_host_factory()
+        host.child_check_interval = 60.0
+        file1 = host.open("path1", "w")
+        self._failing_voidresp(file1, "426 connection closed")
+        file1.close()
+        child, _, trusted = host._idle_children[0]
+        self.assertTrue(child is file1._host)
+        self.assertFalse(trusted)
+        # The check fails, so we get a new child.
+        def timed_out_pwd():
+            raise ftplib.error_temp("421 timeout")
+        child._session.pwd = timed_out_pwd
+        file2 = host.open("path2", "w")
+        self.assertTrue(file2._host is not child)
+        self.assertEqual(host._children, [file2._host])
+
+    def test_failed_close(self):
+        """A child whose close failed isn't reused."""
+        host = test_base.ftp_host_factory()
+        file1 = host.open("path1", "w")
+        self._failing_voidresp(file1, "550 something went wrong",
+                               exception=ftplib.error_perm)
+        self.assertRaises(ftputil.error.FTPIOError, file1.close)
+        self.assertTrue(file1.closed)
+        self.assertTrue(file1._host.closed)
+        self.assertEqual(host._children, [])
+        self.assertEqual(len(host._idle_children), 0)
+
     def test_write_to_directory(self):
         """Test whether attempting to write to a directory fails."""
         host = test_base.ftp_host_factory()
@@ -450,6 +450,144 @@ class TestTimeShift(unittest.TestCase):
         self.assertEqual(host.time_shift(), presumed_time_shift)
 
 
+class TestWalk(unittest.TestCase):
+
+    def setUp(self):
+        self.host = test_base.ftp_host_factory()
+        self.listed = []
+        host_dir = self.host._stat._host_dir
+        def counting_host_dir(path):
+            self.listed.append(path)
+            return host_dir(path)
+        self.host._stat._host_dir = counting_host_dir
+
+    def test_walk(self):
+        result = list(self.host.walk("/home/file_name_test"))
+        # The link `ü` points to a directory, but isn't descended into.
+        self.assertEqual(result, [
+          ("/home/file_name_test", ["ä", "empty_ä", "ü"], ["ö"]),
+          ("/home/file_name_test/ä", [], ["ö", "o"]),
+          ("/home/file_name_test/empty_ä", [], [])])
+        # Each directory once, plus the parents needed to check that
+        # `top` is a directory.
+        self.assertEqual(sorted(self.listed),
+                         ["/", "/home", "/home/file_name_test",
+                          "/home/file_name_test/empty_ä",
+                          "/home/file_name_test/ä"])
+
+    def test_walk_bottom_up(self):
+        result = list(self.host.walk("/home/file_name_test", topdown=False))
+        self.assertEqual([item[0] for item in result],
+                         ["/home/file_name_test/ä",
+                          "/home/file_name_test/empty_ä",
+                          "/home/file_name_test"])
+
+    def test_walk_stats(self):
+        result = list(self.host.walk("/home/dir with spaces", stats=True))
+        self.assertEqual(len(result), 1)
+        dirpath, dirs, nondirs, stat_results = result[0]
+        self.assertEqual(nondirs, ["file with spaces"])
+        self.assertEqual(stat_results["file with spaces"].st_size, 4604)
+        # Nothing more to list for `stat` calls on the walked names.
+        del self.listed[:]
+        self.host.stat("/home/dir with spaces/file with spaces")
+        self.assertEqual(self.listed, [])
+
+    def test_walk_known_directory(self):
+        result = list(self.host.walk("/home/dir with spaces",
+                                     check_dir=False))
+        self.assertEqual(result, [
+          ("/home/dir with spaces", [], ["file with spaces"])])
+        self.assertEqual(self.listed, ["/home/dir with spaces"])
+
+    def test_walk_missing_directory(self):
+        errors = []
+        self.assertEqual(list(self.host.walk("/home/missing",
+                                             onerror=errors.append)), [])
+        self.assertEqual(len(errors), 1)
+
+
+class CommandRecordingSession(mock_ftplib.MockUnixFormatSession):
+
+    def __init__(self, *args, **kwargs):
+        super(CommandRecordingSession, self).__init__(*args, **kwargs)
+        self.commands = []
+
+    def cwd(self, path):
+        self.commands.append(("cwd", path))
+        super(CommandRecordingSession, self).cwd(path)
+
+    def dir(self, *args):
+        self.commands.append(("dir", args[-2]))
+        super(CommandRecordingSession, self).dir(*args)
+
+
+class NoListingByPathSession(CommandRecordingSession):
+
+    def dir(self, *args):
+        if args[-2]:
+            raise ftplib.error_perm("501 syntax error in arguments")
+        super(NoListingByPathSession, self).dir(*args)
+
+
+class TestListingMode(unittest.TestCase):
+
+    def host(self, listing_mode, session_factory=CommandRecordingSession):
+        host = test_base.ftp_host_factory(session_factory=session_factory)
+        host.listing_mode = listing_mode
+        return host
+
+    def test_chdir(self):
+        host = self.host("chdir")
+        host._dir("/home")
+        self.assertEqual(host._session.commands,
+                         [("cwd", "/home/sschwarzer"), ("cwd", "/home"),
+                          ("dir", ""), ("cwd", "/home/sschwarzer")])
+
+    def test_track(self):
+        host = self.host("track")
+        host._dir("/home")
+        host._dir("/home")
+        host._dir("/home/sschwarzer")
+        self.assertEqual(host._session.commands,
+                         [("cwd", "/home"), ("dir", ""), ("dir", ""),
+                          ("cwd", "/home/sschwarzer"), ("dir", "")])
+        self.assertEqual(host.getcwd(), "/home/sschwarzer")
+
+    def test_chdir_after_track(self):
+        """Relative paths are still relative to `getcwd()`."""
+        host = self.host("track")
+        host._dir("/home")
+        host.chdir("python")
+        self.assertEqual(host.getcwd(), "/home/sschwarzer/python")
+        self.assertEqual(host._session.pwd(), "/home/sschwarzer/python")
+        host.listdir("..")
+        self.assertEqual(host._session.pwd(), "/home/sschwarzer")
+        self.assertEqual(host.getcwd(), "/home/sschwarzer/python")
+
+    def test_direct(self):
+        host = self.host("direct")
+        host._dir("/home")
+        # Paths with whitespace take the workaround.
+        host._dir("/home/dir with spaces")
+        self.assertEqual(host._session.commands,
+                         [("dir", "/home"),
+                          ("cwd", "/home/dir with spaces"), ("dir", "")])
+
+    def test_direct_fallback(self):
+        host = self.host("direct", session_factory=NoListingByPathSession)
+        self.assertEqual(host.listdir("/home/sschwarzer")[:2],
+                         ["chemeng", "download"])
+        self.assertEqual(host.listing_mode, "track")
+
+    def test_direct_missing_directory(self):
+        host = self.host("direct")
+        self.assertRaises(ftputil.error.PermanentError,
+                          host._dir, "/home/missing")
+        # Not the server's fault, so keep listing by path.
+        self.assertEqual(host.listing_mode, "direct")
+
+
 class TestAcceptEitherUnicodeOrBytes(unittest.TestCase):
     """
     Test whether certain `FTPHost` methods accept either unicode
@@ -0,0 +1,99 @@
+# Copyright (C) 2013, Stefan Schwarzer <sschwarzer@sschwarzer.net>
+# See the file LICENSE for licensing terms.
+
+from __future__ import unicode_literals
+
+import time
+import unittest
+
+import ftputil.lrucache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ftputil.lrucache.LRUCache(3)
+
+    def test_get_set(self):
+        self.assertRaises(ftputil.lrucache.CacheKeyError,
+                          self.cache.__getitem__, "a")
+        self.cache["a"] = 1
+        self.assertEqual(self.cache["a"], 1)
+        self.cache["a"] = 2
+        self.assertEqual(self.cache["a"], 2)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_eviction_order(self):
+        for key in "abc":
+            self.cache[key] = key
+        # Reading and writing both count as use.
+        self.cache["a"]
+        self.cache["b"] = "b"
+        self.cache["d"] = "d"
+        self.assertFalse("c" in self.cache)
+        self.assertEqual(list(self.cache), ["a", "b", "d"])
+        self.cache["e"] = "e"
+        self.assertEqual(list(self.cache), ["b", "d", "e"])
+
+    def test_delete(self):
+        for key in "abc":
+            self.cache[key] = key
+        self.assertEqual(self.cache.__delitem__("b"), "b")
+        self.assertRaises(ftputil.lrucache.CacheKeyError,
+                          self.cache.__delitem__, "b")
+        self.assertEqual(list(self.cache), ["a", "c"])
+        # There's room again, so nothing is evicted.
+        self.cache["d"] = "d"
+        self.assertEqual(list(self.cache), ["a", "c", "d"])
+
+    def test_resize(self):
+        for key in "abc":
+            self.cache[key] = key
+        self.cache["a"]
+        self.cache.size = 1
+        self.assertEqual(list(self.cache), ["a"])
+        self.cache.size = 5
+        for key in "bcde":
+            self.cache[key] = key
+        self.assertEqual(len(self.cache), 5)
+        self.assertRaises(ValueError, setattr, self.cache, "size", 0)
+        self.assertRaises(TypeError, setattr, self.cache, "size", 1.5)
+
+    def test_iteration_while_accessing(self):
+        for key in "abc":
+            self.cache[key] = key
+        # Accessing items doesn't disturb a running iteration.
+        self.assertEqual([self.cache[key] for key in self.cache],
+                         ["a", "b", "c"])
+        self.assertEqual(list(self.cache), ["a", "b", "c"])
+
+    def test_mtime(self):
+        self.cache["a"] = 1
+        mtime = self.cache.mtime("a")
+        self.assertTrue(abs(mtime - time.time()) < 5)
+        # Only writing changes the modification time.
+        self.cache["a"]
+        self.assertEqual(self.cache.mtime("a"), mtime)
+        self.assertRaises(ftputil.lrucache.CacheKeyError,
+                          self.cache.mtime, "b")
+
+    def test_clear(self):
+        for key in "abc":
+            self.cache[key] = key
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(list(self.cache), [])
+        self.assertEqual(self.cache.size, 3)
+
+    def test_large_cache(self):
+        # Filling a big cache shouldn't take quadratic time.
+        cache = ftputil.lrucache.LRUCache(1000)
+        start = time.time()
+        for i in range(200000):
+            cache[i] = i
+        self.assertTrue(time.time() - start < 10)
+        self.assertEqual(list(cache)[0], 199000)
+
+
+if __name__ == "__main__":
+    unittest.main()
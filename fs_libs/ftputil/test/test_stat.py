@@ -449,5 +449,84 @@ class TestListdir(unittest.TestCase):
             self.assertTrue(file in remote_file_list)
 
 
+
+class TestMLSD(unittest.TestCase):
+    """Test stat'ing via `MLSD` and the fallback to `LIST`."""
+
+    def setUp(self):
+        self.host = test_base.ftp_host_factory(
+                      session_factory=mock_ftplib.MockMLSDFormatSession)
+        self.stat = self.host._stat
+
+    def test_mlsd_parser(self):
+        parser = ftputil.stat.MLSDParser()
+        stat_result = parser.parse_line(
+                        "type=file;size=4605;modify=20200119123456.5;"
+                        "UNIX.mode=0644;unix.owner=45854; newer file")
+        self.assertEqual(stat_result._st_name, "newer file")
+        self.assertEqual(stat_result.st_mode, stat.S_IFREG | 0o644)
+        self.assertEqual(stat_result.st_size, 4605)
+        self.assertEqual(stat_result.st_uid, "45854")
+        # UTC, to the second and beyond, no guessing.
+        self.assertEqual(stat_result.st_mtime, 1579437296.5)
+        self.assertEqual(stat_result._st_mtime_precision, 1)
+        stat_result = parser.parse_line(
+                        "type=OS.unix=slink:../Target;modify=20020119000000; link")
+        self.assertTrue(stat.S_ISLNK(stat_result.st_mode))
+        self.assertEqual(stat_result._st_target, "../Target")
+        self.assertTrue(parser.ignores_line("type=cdir;modify=20000504120000; ."))
+        for line in ["type=file;size=12", "type=socket; name",
+                     "type=file;modify=2002; name", "type=file;size=x; name"]:
+            self.assertRaises(ftputil.error.ParserError,
+                              parser.parse_line, line)
+
+    def test_lstat_via_mlsd(self):
+        stat_result = self.stat._lstat("/home/newer")
+        self.assertEqual(stat_result.st_mtime, 1579437296.789)
+        self.assertEqual(stat_result.st_mode, stat.S_IFREG | 0o644)
+        self.assertTrue(self.stat._use_mlsd)
+        # No write permission in `perm`, so only read access.
+        stat_result = self.stat._lstat("/home/sschwarzer/index.html")
+        self.assertEqual(stat_result.st_mode, stat.S_IFREG | 0o400)
+
+    def test_listdir_via_mlsd(self):
+        self.assertEqual(sorted(self.stat._listdir("/home")),
+                         ["dir with spaces", "link", "newer", "older",
+                          "sschwarzer"])
+        self.assertEqual(self.stat._listdir("/home/dir with spaces"),
+                         ["file with spaces"])
+
+    def test_stat_following_link(self):
+        stat_result = self.stat._stat("/home/link")
+        self.assertEqual(stat_result.st_size, 4604)
+
+    def test_time_shift(self):
+        self.host.set_time_shift(3 * 60 * 60)
+        stat_result = self.stat._lstat("/home/older")
+        self.assertEqual(stat_result.st_mtime, 18 * 24 * 60 * 60 + 3 * 60 * 60)
+
+    def test_fallback_without_feat(self):
+        stat = _test_stat(session_factory=mock_ftplib.MockUnixFormatSession)
+        self.assertEqual(len(stat._listdir("/home/sschwarzer")), 9)
+        self.assertFalse(stat._use_mlsd)
+
+    def test_fallback_if_mlsd_fails(self):
+        stat = _test_stat(
+                 session_factory=mock_ftplib.MockMLSDNotImplementedSession)
+        self.assertEqual(len(stat._listdir("/home/sschwarzer")), 9)
+        self.assertFalse(stat._use_mlsd)
+
+    def test_use_mlsd_switched_off(self):
+        self.host.use_mlsd = False
+        # The LIST listing of the same directory has more entries.
+        self.assertEqual(len(self.stat._listdir("/home/sschwarzer")), 9)
+
+    def test_missing_directory(self):
+        self.assertRaises(ftputil.error.PermanentError,
+                          self.stat._listdir, "/home/notthere")
+        # A missing directory doesn't mean `MLSD` is unsupported.
+        self.assertTrue(self.stat._use_mlsd)
+
+
 if __name__ == "__main__":
     unittest.main()
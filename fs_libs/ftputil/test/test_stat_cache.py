@@ -98,5 +98,105 @@ class TestStatCache(unittest.TestCase):
         self.assertEqual(items[:3], ["chemeng", "download", "image"])
 
 
+class TestDirectoryMode(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ftputil.stat_cache.StatCache()
+        self.cache.by_directory = True
+
+    def test_get_set(self):
+        self.cache.set_directory("/dir", {"file1": "test1", "file2": "test2"})
+        self.assertEqual(self.cache["/dir/file1"], "test1")
+        self.assertTrue("/dir/file2" in self.cache)
+        self.assertFalse("/dir/file3" in self.cache)
+        self.assertEqual(len(self.cache), 2)
+        # Single entries can still be set.
+        self.cache["/other"] = "test3"
+        self.assertEqual(self.cache["/other"], "test3")
+
+    def test_path_mode(self):
+        """Without directory mode, listings are stored entry by entry."""
+        self.cache.by_directory = False
+        self.cache.set_directory("/dir", {"file1": "test1"})
+        self.assertEqual(self.cache["/dir/file1"], "test1")
+        self.assertEqual(len(self.cache._directories), 0)
+
+    def test_invalidate(self):
+        self.cache.set_directory("/dir", {"file1": "test1", "file2": "test2"})
+        self.cache.set_directory("/dir/file1", {"file3": "test3"})
+        self.cache.invalidate("/dir/file1")
+        self.assertFalse("/dir/file1" in self.cache)
+        self.assertFalse("/dir/file1/file3" in self.cache)
+        self.assertEqual(self.cache["/dir/file2"], "test2")
+
+    def test_eviction(self):
+        """A big listing doesn't evict entries of other directories."""
+        self.cache.resize(10)
+        self.cache.resize_directories(2)
+        self.cache.set_directory("/dir1", {"file": "test1"})
+        self.cache.set_directory(
+          "/dir2", dict(("file{0:d}".format(i), i) for i in range(100)))
+        self.assertEqual(self.cache["/dir2/file99"], 99)
+        self.assertEqual(self.cache["/dir1/file"], "test1")
+        self.cache.set_directory("/dir3", {"file": "test3"})
+        # `/dir1` was used more recently than `/dir2`.
+        self.assertTrue("/dir1/file" in self.cache)
+        self.assertFalse("/dir2/file1" in self.cache)
+
+    def test_pin(self):
+        self.cache.resize_directories(1)
+        # Pin before the directory is listed, like `FTPHost.walk`.
+        self.cache.pin("/dir1")
+        self.cache.set_directory("/dir1", {"file": "test1"})
+        self.cache.set_directory("/dir2", {"file": "test2"})
+        self.assertEqual(self.cache["/dir1/file"], "test1")
+        self.assertEqual(self.cache["/dir2/file"], "test2")
+        # Pins are counted.
+        self.cache.pin("/dir1")
+        self.cache.unpin("/dir1")
+        self.cache.set_directory("/dir3", {"file": "test3"})
+        self.assertEqual(self.cache["/dir1/file"], "test1")
+        self.cache.unpin("/dir1")
+        self.assertFalse("/dir1/file" in self.cache)
+        self.assertEqual(self.cache._pinned, {})
+        # Unpinning an unknown directory is ignored.
+        self.cache.unpin("/dir1")
+
+    def test_max_age(self):
+        self.cache.max_age = 1
+        self.cache.pin("/dir")
+        self.cache.set_directory("/dir", {"file": "test"})
+        time.sleep(0.5)
+        self.assertEqual(self.cache["/dir/file"], "test")
+        time.sleep(0.6)
+        # Pinned listings expire, too.
+        self.assertRaises(ftputil.error.CacheMissError,
+                          self.cache.__getitem__, "/dir/file")
+
+    def test_disabled(self):
+        self.cache.disable()
+        self.cache.set_directory("/dir", {"file": "test"})
+        self.assertRaises(ftputil.error.CacheMissError,
+                          self.cache.__getitem__, "/dir/file")
+
+    def test_walk_lists_once(self):
+        """`FTPHost.walk` lists every directory only once."""
+        host = test_base.ftp_host_factory()
+        host.stat_cache.by_directory = True
+        # Room for only one listing, so anything not pinned is gone
+        # after the next listing.
+        host.stat_cache.resize_directories(1)
+        listed = []
+        host_dir = host._stat._host_dir
+        def counting_host_dir(path):
+            listed.append(path)
+            return host_dir(path)
+        host._stat._host_dir = counting_host_dir
+        result = list(host.walk("/home/file_name_test"))
+        self.assertEqual(len(result), 3)
+        self.assertEqual(sorted(listed), sorted(set(listed)))
+        self.assertEqual(host.stat_cache._pinned, {})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -2,3 +2,23 @@
 
 username='Anonymous'
 password='Anon@anon.com'
+
+# On an incremental rescan, don't LIST folders whose mtime and link count are the same as last time (unix style servers only).
+# Files changed in place inside those folders are missed, set to False to always list everything.
+prune_dirs=True
+
+# Logged-in sessions per host LISTing folders at the same time.  0 walks with the one session and lets the scheduler split the tree up,
+# anything higher walks the whole target in one job with that many LISTs in flight (good for slow or far away servers).
+walk_sessions=0
+
+# How folders get LISTed.  'chdir' changes into the folder and back out for every LIST (three round trips, works everywhere),
+# 'track' changes into it and stays there, 'direct' sends LIST with the full path and drops back to 'track' if the server can't take it.
+# Folders with spaces in the name always get the CWD treatment.
+listing_mode='track'
+
+# Logged-in sessions kept around for opening files.  Sessions idle longer than session_idle_timeout seconds get logged out (keep it
+# under the server's own idle timeout), and one idle for session_check_interval seconds or more gets a PWD to make sure it's alive
+# before it's used.
+max_idle_sessions=10
+session_idle_timeout=60
+session_check_interval=5
@@ -1 +1,12 @@
 #!/usr/bin/python
+
+# Pseudo-filesystems that the walker won't go into.  Set to [] to scan everything.
+skip_paths=['/proc','/sys','/dev']
+
+# Number of threads listing folders at once.  0 walks one folder at a time and lets the scheduler split the tree up between workers,
+# anything higher walks the whole target in one job with that many readdirs in flight (good for high-latency NFS/CIFS mounts).
+walk_threads=0
+
+# On an incremental rescan, don't list folders whose mtime and link count are the same as last time.  Files changed in place
+# inside those folders are missed, set to False to always list everything.  Only used with walk_threads=0.
+prune_dirs=True
@@ -7,23 +7,38 @@
 # extension plugin
 
 from hashlib import md5
+import pdb
+from libramen import content
 
-# All action plugins have an action method that gets called by the scanner process
-# The scanner process doesn't do anything with the action returned values, it's up to you to store it in the DB or perform some action
-def action(attr):
-    blocksize = 65536
-    md5hash = md5()
-    with open(attr.path,'r') as afile:
-        buf = afile.read(blocksize)
-        while len(buf) > 0:
-            md5hash.update(buf)
-            buf = afile.read(blocksize)
-    hash = md5hash.digest()
-    print hash.encode('hex')
-    # Here is where you'd interface with the DB to *SAVE IT YOURSELF*
-    # Note that you'll need to run django syncdb for the DB results to show up
-    # ...and you'll need to add code to the django search view.
-    return hash.encode('hex')
+# Content plugins have a stream method -- the scanner reads each file once and feeds every content plugin the same chunks (see libramen/content.py)
+# Whatever you want saved goes on the fileobj, return values aren't used.
+class md5stream:
+    def __init__(self,fileobj):
+        self.fileobj = fileobj
+        self.md5hash = md5()
+
+    def update(self,chunk):
+        self.md5hash.update(chunk)
+
+    def finalize(self):
+        self.fileobj.hash = self.md5hash.digest()
+
+def stream(fileobj,filesystem):
+    if fileobj.folder == True:
+        return None
+
+    # This is too...unlikely to be correct.
+    # Regular files only, thx.  (this may also get socket files...)
+    #if (fileobj.stat.st_mode < 10000):
+    #    return None
+
+    # /dev, /proc and /sys are skipped by the local_disk walker now (skip_paths in fs_settings/local_disk.py)
+    return md5stream(fileobj)
+
+# All action plugins have an action method -- the scanner uses stream() instead when there is one, this is for running it on its own.
+def action(fileobj,filesystem):
+    content.feed(fileobj,filesystem,[stream(fileobj,filesystem)] if not fileobj.folder else [])
+    return fileobj.hash.encode('hex') if fileobj.hash is not None else None
 
 # This is for testing purposes
 if __name__ == "__main__":
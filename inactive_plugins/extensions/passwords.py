@@ -3,9 +3,8 @@ import re,time
 # Stuff that only needs to be instanced once throughout the entire modules use should be here
 passwd_regex = re.compile('^.*pass.*=.*$')
 
-# All extensions need a __match__ to see if the attrs match and the module should be run
-def __match__(fattrs):
-        return True if re.match(r'^.*\.(config|ini|eml)$',fattrs.filename) else False
+# Extensions say which files they want with MATCH (see libramen/dispatch.py), or a __match__ function if that isn't enough.
+MATCH = {'extensions':['config','ini','eml'], 'folder':False}
 
 # All extensions have an action, which is run if the __match__ is true. If you want all matches to be true, you want to write an action, not an extension.
 def action(fattrs):
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+#
+#
+#           Checkpoint.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   Checkpoint.py keeps track of where a scan is at so it can be picked back up with --resume.
+#   For every (host, filesystem) we remember the folders that have been walked and the frontier of folders that were found but not walked yet.
+#   The writer only saves it right after a commit, so anything the checkpoint says is walked is actually in the db.
+#
+import os
+import pickle
+import time
+import settings
+
+class Checkpoint:
+    def __init__(self, path=None, interval=None):
+        self.path = path or getattr(settings, 'CHECKPOINT', 'data/checkpoint.pickle')
+        # Minimum number of seconds between saves -- pickling the walked sets of a big scan isn't free.
+        self.interval = interval or getattr(settings, 'CHECKPOINT_INTERVAL', 300)
+        self.last_save = 0
+        # (host, product) -> set of folder paths
+        self.frontier = {}
+        self.walked = {}
+        # History run id (see history.py) -- a resumed scan carries on the same run.
+        self.run = int(time.time())
+
+    def load(self):
+        # Returns False if there was nothing to resume from.
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'rb') as saved:
+            state = pickle.load(saved)
+        self.frontier = state['frontier']
+        self.walked = state['walked']
+        self.run = state.get('run', self.run)
+        return True
+
+    def start(self, key, path='/'):
+        # A target we have never seen starts at the root.  One we've seen keeps whatever frontier it had (empty means it finished).
+        if key not in self.frontier:
+            self.frontier[key] = set([path])
+            self.walked[key] = set()
+
+    def walk(self, key, path, subdirs):
+        self.start(key)
+        self.walked[key].add(path)
+        self.frontier[key].discard(path)
+        for subdir in subdirs:
+            if subdir not in self.walked[key]:
+                self.frontier[key].add(subdir)
+
+    def remaining(self, key):
+        if key not in self.frontier:
+            return ['/']
+        return sorted(self.frontier[key])
+
+    def save(self, force=False):
+        if not force and time.time() - self.last_save < self.interval:
+            return
+        # write then rename so a crash mid-save doesn't eat the old checkpoint.
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as saved:
+            pickle.dump({'frontier':self.frontier, 'walked':self.walked, 'run':self.run}, saved, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, self.path)
+        self.last_save = time.time()
+
+    def clear(self):
+        # The scan finished, nothing to resume.
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+#
+#
+#           Content.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   Content.py reads a file once for every plugin that wants it's contents.  Without it MD5 + SHA256 + a keyword scanner
+#   means downloading the same file three times over FTP.
+#
+#   A plugin that wants to see the contents has a stream(fileobj, filesystem) function instead of action() -- a plugin with both only gets stream().
+#   It returns an object with:
+#       update(chunk) - called with every block of the file in order.  Return False to say you've seen enough -- store whatever
+#                       you found on fileobj first, you won't get a finalize().  Raising drops you and only you.
+#       finalize()    - called once the whole file went by, store your results on fileobj here.
+#   or None if it isn't interested in this file.
+#
+import traceback
+import settings
+
+def consumers(modules, fileobj, filesystem):
+    # The stream objects from every module that has one and wants this file.
+    found = []
+    for module in modules:
+        try:
+            consumer = module.stream(fileobj, filesystem)
+        except:
+            print "Stream setup failed"
+            print traceback.format_exc()
+            continue
+        if consumer is not None:
+            found.append(consumer)
+    return found
+
+def feed(fileobj, filesystem, consumers, blocksize=None):
+    # Opens the file one time and hands every chunk to every consumer still listening.  The ones still listening at the end get finalized.
+    if not consumers or fileobj.folder:
+        return
+    blocksize = blocksize or getattr(settings, 'READ_BLOCKSIZE', 65536)
+    listening = list(consumers)
+    try:
+        file_desc = filesystem.open(fileobj.relpath + fileobj.filename)
+    except:
+        print "Couldn't open " + fileobj.relpath + fileobj.filename
+        return
+    try:
+        buf = file_desc.read(blocksize)
+        while len(buf) > 0 and listening:
+            for consumer in list(listening):
+                try:
+                    wants_more = consumer.update(buf) is not False
+                except Exception:
+                    # One broken plugin shouldn't cost the others the file.
+                    print "Stream update failed on " + fileobj.relpath + fileobj.filename
+                    print traceback.format_exc()
+                    wants_more = False
+                if not wants_more:
+                    listening.remove(consumer)
+            if not listening:
+                break
+            buf = file_desc.read(blocksize)
+    except:
+        # A half-read file would give everyone wrong answers, so nobody finalizes.
+        print "Read failed on " + fileobj.relpath + fileobj.filename
+        print traceback.format_exc()
+        return
+    finally:
+        if hasattr(file_desc, 'close'):
+            file_desc.close()
+
+    for consumer in listening:
+        try:
+            consumer.finalize()
+        except:
+            print "Stream finalize failed"
+            print traceback.format_exc()
@@ -0,0 +1,94 @@
+#!/usr/bin/python
+#
+#
+#           Dispatch.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   Dispatch.py decides which extensions run on a file.  Instead of calling every extension's __match__ on every file,
+#   extensions can declare what they want in a MATCH dict and all of them get compiled into one table:
+#
+#       MATCH = {
+#           'extensions': ['pst', 'ost'],   # lowercase, no dot
+#           'path': r'^/home/',             # regex searched against the full path
+#           'min_size': 1024,               # bytes, inclusive
+#           'max_size': 10*1024**3,
+#           'folder': False,                # True for folders only, False for files only, leave out for both
+#       }
+#
+#   A file is looked up by extension once, only the extensions it could belong to get their size and path checks, and only
+#   the ones that pass everything get run.  If an extension also has a __match__ it still gets the final say, and extensions with
+#   only a __match__ work the same as they always did.
+#
+import re
+import traceback
+import indexes
+
+class Dispatcher:
+    def __init__(self, modules):
+        self.modules = modules or []
+        # ext -> [(module, criteria)] for extensions that only want certain extensions
+        self.by_ext = {}
+        # [(module, criteria)] that take any extension
+        self.any_ext = []
+        # Extensions with nothing declared, __match__ is all we've got.
+        self.legacy = []
+        for module in self.modules:
+            criteria = getattr(module, 'MATCH', None)
+            if criteria is None:
+                self.legacy.append(module)
+                continue
+            criteria = dict(criteria)
+            if criteria.get('path') is not None:
+                criteria['path'] = re.compile(criteria['path'])
+            if criteria.get('extensions'):
+                # 'ini' and 'INI' are the same extension, don't run the module twice for it.
+                for ext in set(ext.lower().lstrip('.') for ext in criteria['extensions']):
+                    self.by_ext.setdefault(ext, []).append((module, criteria))
+            else:
+                self.any_ext.append((module, criteria))
+
+    def __iter__(self):
+        return iter(self.modules)
+
+    def __len__(self):
+        return len(self.modules)
+
+    def call(self, module, fileobj):
+        # One broken __match__ shouldn't keep the other extensions from running.
+        try:
+            return module.__match__(fileobj)
+        except:
+            print "Extension Failed."
+            print traceback.format_exc()
+            return False
+
+    def matching(self, fileobj):
+        # The extension modules that should run on fileobj, in the order they were loaded.
+        if fileobj.folder:
+            path = fileobj.relpath
+        else:
+            path = fileobj.relpath + fileobj.filename
+        candidates = self.any_ext + self.by_ext.get(indexes.extension(fileobj.filename), [])
+        found = []
+        for module, criteria in candidates:
+            if 'folder' in criteria and bool(criteria['folder']) != bool(fileobj.folder):
+                continue
+            size = getattr(fileobj, 'size', None)
+            if criteria.get('min_size') is not None and (size is None or size < criteria['min_size']):
+                continue
+            if criteria.get('max_size') is not None and (size is None or size > criteria['max_size']):
+                continue
+            if criteria.get('path') is not None and criteria['path'].search(path) is None:
+                continue
+            if hasattr(module, '__match__') and not self.call(module, fileobj):
+                continue
+            found.append(module)
+        for module in self.legacy:
+            if self.call(module, fileobj):
+                found.append(module)
+        if len(found) > 1:
+            found.sort(key=self.modules.index)
+        return found
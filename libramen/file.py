@@ -7,6 +7,7 @@
 import time
 import persistent
 
+# Legacy -- the scanner stores record.Record now.  This stays so databases written before that still load and can be converted with migrate.py
 class File(persistent.Persistent):
     def __init__(self, filename, relpath, stat, target, folder=False):
 
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+#
+#
+#           HashCache.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   HashCache.py remembers the hashes from earlier scans so a file that hasn't changed doesn't get read again.  Entries are
+#   keyed by (host, product, path) and only count as a hit while the size and mtime still match what was hashed.
+#
+#   It's a sqlite file instead of part of the ZODB because every plugin worker process reads and writes it at the same
+#   time, and only the writer process is allowed near the ZODB.
+#
+import os
+import sqlite3
+import cPickle
+import traceback
+import settings
+
+class HashCache:
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, 'HASH_CACHE', 'data/hashcache.sqlite')
+        # Other workers may be holding the write lock for a moment.
+        self.db = sqlite3.connect(self.path, timeout=60)
+        self.db.text_factory = str
+        self.db.execute('PRAGMA journal_mode=WAL')
+        # Losing the last few entries in a crash only means hashing those files again.
+        self.db.execute('PRAGMA synchronous=OFF')
+        self.db.execute('CREATE TABLE IF NOT EXISTS hashes (host TEXT, product TEXT, path TEXT, size INTEGER, mtime REAL, '
+                        'hash BLOB, digests BLOB, PRIMARY KEY (host, product, path))')
+        self.db.commit()
+
+    def get(self, host, product, path, size, mtime):
+        # (hash, digests) from the last time this file was hashed, or None if it's new or has changed since.
+        row = self.db.execute('SELECT size, mtime, hash, digests FROM hashes WHERE host=? AND product=? AND path=?',
+                              (host, product, path)).fetchone()
+        if row is None or row[0] != size or row[1] != mtime:
+            return None
+        hash = str(row[2]) if row[2] is not None else None
+        return hash, cPickle.loads(str(row[3]))
+
+    def put(self, host, product, path, size, mtime, hash, digests):
+        self.db.execute('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (host, product, path, size, mtime, sqlite3.Binary(hash) if hash is not None else None,
+                         sqlite3.Binary(cPickle.dumps(digests, 2))))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+# One connection per process -- sqlite connections don't survive a fork.
+_caches = {}
+
+def cache():
+    if getattr(settings, 'HASH_CACHE', 'data/hashcache.sqlite') is None:
+        return None
+    pid = os.getpid()
+    if pid not in _caches:
+        _caches.clear()
+        try:
+            _caches[pid] = HashCache()
+        except:
+            print "Couldn't open the hash cache, hashing everything"
+            print traceback.format_exc()
+            _caches[pid] = None
+    return _caches[pid]
+
+def key(fileobj):
+    # None when the handler can't tell us enough to know if the file changed.
+    if fileobj.folder or fileobj.size is None or fileobj.mtime is None:
+        return None
+    return fileobj.host, fileobj.product, fileobj.relpath + fileobj.filename, fileobj.size, fileobj.mtime
+
+def restore(fileobj):
+    # Puts the cached hashes back on fileobj.  True if it found any.
+    found = key(fileobj)
+    hashes = cache()
+    if found is None or hashes is None:
+        return False
+    try:
+        hit = hashes.get(*found)
+    except:
+        print "Hash cache lookup failed"
+        print traceback.format_exc()
+        return False
+    if hit is None:
+        return False
+    hash, digests = hit
+    if hash is not None:
+        fileobj.hash = hash
+    if digests:
+        if fileobj.attrs is None:
+            fileobj.attrs = {}
+        fileobj.attrs.update(digests)
+    return True
+
+def store(fileobj, digests):
+    # digests - the attrs a hashing plugin just set, saved alongside fileobj.hash.
+    found = key(fileobj)
+    hashes = cache()
+    if found is None or hashes is None:
+        return
+    try:
+        hashes.put(*(found + (fileobj.hash, digests)))
+    except:
+        print "Hash cache update failed"
+        print traceback.format_exc()
@@ -0,0 +1,154 @@
+#!/usr/bin/python
+#
+#
+#           History.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   History.py remembers what every scan changed so "what's different since last week" has an answer.  The file tree in
+#   filesystem.root is always the latest scan -- each run only logs the paths it added, modified or removed along with what
+#   was there before it touched them.  Going back in time means undoing the runs after the one you want, so the history
+#   grows with how much changes and not with how big the tree is.
+#
+#   Run IDs are the time the scan started (a --resume keeps the ID of the scan it picks back up).
+#
+import persistent
+from BTrees.OOBTree import OOBTree
+from BTrees.LOBTree import LOBTree
+
+ADDED = 'added'
+MODIFIED = 'modified'
+REMOVED = 'removed'
+
+def exists(record):
+    # Tombstones (see snapshot.py) mean it wasn't there.
+    return record is not None and getattr(record, 'deleted', None) is None
+
+def differs(old, new):
+    # getattr because an un-migrated database can still hand us an old file.File
+    for name in ('folder', 'size', 'mtime', 'mode', 'hash'):
+        if getattr(old, name, None) != getattr(new, name, None):
+            return True
+    return False
+
+def kind(old, new):
+    # What changing old into new counts as, None if it's the same file as far as we can tell.
+    if not exists(old):
+        return ADDED if exists(new) else None
+    if not exists(new):
+        return REMOVED
+    return MODIFIED if differs(old, new) else None
+
+class Run(persistent.Persistent):
+    def __init__(self, run, started):
+        self.run = run
+        self.started = started
+        self.finished = None
+        # path -> (kind, the record before this run touched it -- None if there wasn't one)
+        self.changes = OOBTree()
+        self.counts = {ADDED:0, MODIFIED:0, REMOVED:0}
+
+class History(persistent.Persistent):
+    def __init__(self):
+        # run id -> Run
+        self.runs = LOBTree()
+
+    def begin(self, run, when):
+        if run not in self.runs:
+            self.runs[run] = Run(run, when)
+        return self.runs[run]
+
+    def finish(self, run, when):
+        if run in self.runs:
+            self.runs[run].finished = when
+
+    def change(self, run, path, old, new):
+        # Called by the writer before new replaces old at path.
+        log = self.begin(run, None)
+        if path in log.changes:
+            # Stored twice in one run (a --resume redoing a folder...) -- keep what was there before the run, redo the kind.
+            first, before = log.changes[path]
+            log.counts[first] -= 1
+        else:
+            before = old
+        found = kind(before, new)
+        if found is None:
+            if path in log.changes:
+                del log.changes[path]
+                log._p_changed = True
+            return
+        log.changes[path] = (found, before)
+        log.counts[found] += 1
+        log._p_changed = True
+
+    def later(self, run):
+        # The runs after run, oldest first.
+        return self.runs.values(run, excludemin=True)
+
+    def overlay(self, run):
+        # {path: record as of run} for every path something after run changed.
+        found = {}
+        for log in self.later(run):
+            for path, (change, before) in log.changes.iteritems():
+                if path not in found:
+                    found[path] = before
+        return found
+
+def get(filesystem):
+    # The history for a filesystem, made the first time we ask (like indexes.get).
+    history = getattr(filesystem, 'history', None)
+    if history is None:
+        history = filesystem.history = History()
+    return history
+
+def runs(filesystem):
+    # [(run id, Run)] oldest first
+    history = getattr(filesystem, 'history', None)
+    if history is None:
+        return []
+    return list(history.runs.items())
+
+def lookup(filesystem, path, run):
+    # The record at path as of the end of run, None if there wasn't anything there.
+    history = get(filesystem)
+    for log in history.later(run):
+        if path in log.changes:
+            before = log.changes[path][1]
+            return before if exists(before) else None
+    record = filesystem.root.get(path)
+    return record if exists(record) else None
+
+def state(filesystem, run):
+    # (path, record) for everything that was there at the end of run.  Only the paths changed since are held in memory.
+    overlay = get(filesystem).overlay(run)
+    for path, record in filesystem.root.iteritems():
+        if path in overlay:
+            record = overlay.pop(path)
+        if exists(record):
+            yield path, record
+    # Paths whose records are gone from the tree entirely.
+    for path, record in overlay.iteritems():
+        if exists(record):
+            yield path, record
+
+def diff(filesystem, first, second):
+    # (path, kind, before, after) for everything that differs between the end of run first and the end of run second.
+    if first > second:
+        first, second = second, first
+    history = get(filesystem)
+    after = history.overlay(second)
+    seen = set()
+    for log in history.runs.values(first, second, excludemin=True):
+        for path, (change, before) in log.changes.iteritems():
+            if path in seen:
+                continue
+            seen.add(path)
+            if path in after:
+                now = after[path]
+            else:
+                now = filesystem.root.get(path)
+            found = kind(before, now)
+            if found is not None:
+                yield path, found, before if exists(before) else None, now if exists(now) else None
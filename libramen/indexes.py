@@ -0,0 +1,158 @@
+#!/usr/bin/python
+#
+#
+#           Indexes.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   Indexes.py keeps secondary indexes next to each filesystem's file tree so questions like "every .pst modified between
+#   January and March" don't have to look at every record.  The writer updates them as records are stored.
+#
+#   Every index maps a key to a set of full paths:
+#       ext   - lowercased file extension ('' for none)
+#       size  - size bucket, the number of bits in the size (so bucket n holds 2**(n-1) <= size < 2**n)
+#       mtime - the day the file was modified (seconds since the epoch / 86400)
+#       hash  - whatever the hashing plugins put in record.hash
+#   Only files are indexed, not folders or tombstones.
+#
+import persistent
+from BTrees.OOBTree import OOBTree, OOTreeSet, intersection, union
+from BTrees.LOBTree import LOBTree
+
+DAY = 86400
+
+def extension(filename):
+    if '.' not in filename[1:]:
+        return ''
+    return filename.rsplit('.', 1)[1].lower()
+
+def size_bucket(size):
+    return int(size).bit_length()
+
+def mtime_bucket(mtime):
+    return int(mtime) // DAY
+
+class Indexes(persistent.Persistent):
+    def __init__(self):
+        self.ext = OOBTree()
+        self.size = LOBTree()
+        self.mtime = LOBTree()
+        self.hash = OOBTree()
+
+    def keys(self, record):
+        # (index, key) pairs this record should be filed under
+        # (getattr because an un-migrated database can still hand us an old file.File)
+        if record is None or record.folder or getattr(record, 'deleted', None) is not None:
+            return []
+        keys = [(self.ext, extension(record.filename))]
+        size = getattr(record, 'size', None)
+        if size is not None:
+            keys.append((self.size, size_bucket(size)))
+        mtime = getattr(record, 'mtime', None)
+        if mtime is not None:
+            keys.append((self.mtime, mtime_bucket(mtime)))
+        hash = getattr(record, 'hash', None)
+        if hash is not None:
+            keys.append((self.hash, hash))
+        return keys
+
+    def add(self, path, record):
+        for index, key in self.keys(record):
+            paths = index.get(key)
+            if paths is None:
+                paths = index[key] = OOTreeSet()
+            paths.insert(path)
+
+    def remove(self, path, record):
+        for index, key in self.keys(record):
+            paths = index.get(key)
+            if paths is None:
+                continue
+            if path in paths:
+                paths.remove(path)
+            if not paths:
+                del index[key]
+
+    def update(self, path, old, new):
+        # old is whatever was stored at path before (None if nothing was)
+        if old is not None:
+            self.remove(path, old)
+        self.add(path, new)
+
+def get(filesystem):
+    # The indexes for a filesystem, made the first time we ask (databases from before indexes existed won't have them).
+    indexes = getattr(filesystem, 'indexes', None)
+    if indexes is None:
+        indexes = filesystem.indexes = Indexes()
+    return indexes
+
+def rebuild(filesystem):
+    # Throws the indexes away and re-files everything in the root.  For old databases (see migrate.py)
+    filesystem.indexes = Indexes()
+    for path, record in filesystem.root.iteritems():
+        filesystem.indexes.add(path, record)
+    return filesystem.indexes
+
+def _range(index, low, high):
+    # Union of the sets for every key in [low, high], either end can be None.
+    result = None
+    for paths in index.values(low, high):
+        result = union(result, paths)
+    return result if result is not None else OOTreeSet()
+
+def find(filesystem, ext=None, min_size=None, max_size=None, after=None, before=None, hash=None):
+    # Iterates over the paths of the files in filesystem that match everything given.  Sizes are bytes, after/before are epoch seconds (inclusive).
+    # Returns None when no criteria were given -- that isn't an index question, walk the root instead.
+    indexes = getattr(filesystem, 'indexes', None)
+    if indexes is None:
+        indexes = rebuild(filesystem)
+    sets = []
+    if ext is not None:
+        if isinstance(ext, basestring):
+            ext = [ext]
+        exts = None
+        for one in ext:
+            exts = union(exts, indexes.ext.get(one.lower().lstrip('.'), OOTreeSet()))
+        sets.append(exts if exts is not None else OOTreeSet())
+    if hash is not None:
+        sets.append(indexes.hash.get(hash, OOTreeSet()))
+    if min_size is not None or max_size is not None:
+        sets.append(_range(indexes.size,
+                           size_bucket(min_size) if min_size is not None else None,
+                           size_bucket(max_size) if max_size is not None else None))
+    if after is not None or before is not None:
+        sets.append(_range(indexes.mtime,
+                           mtime_bucket(after) if after is not None else None,
+                           mtime_bucket(before) if before is not None else None))
+    if not sets:
+        return None
+
+    # Smallest first so the intersections stay small.
+    sets.sort(key=len)
+    result = sets[0]
+    for paths in sets[1:]:
+        if not result:
+            break
+        result = intersection(result, paths)
+
+    if min_size is None and max_size is None and after is None and before is None:
+        return iter(result)
+    return _edges(filesystem, result, min_size, max_size, after, before)
+
+def _edges(filesystem, paths, min_size, max_size, after, before):
+    # Buckets are coarse, check the edges against the records themselves.
+    for path in paths:
+        record = filesystem.root.get(path)
+        if record is None:
+            continue
+        if min_size is not None and record.size < min_size:
+            continue
+        if max_size is not None and record.size > max_size:
+            continue
+        if after is not None and record.mtime < after:
+            continue
+        if before is not None and record.mtime > before:
+            continue
+        yield path
@@ -0,0 +1,181 @@
+#!/usr/bin/python
+#
+#
+#           PathIndex.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   PathIndex.py is the file tree every filesystem keeps in it's root.  Instead of one flat BTree keyed by full path (which repeats
+#   every folder's path in every key under it) each folder owns a BTree of it's own children keyed by name, so listing a folder
+#   or pulling a subtree only touches that part of the tree.
+#
+#   It still acts like the old flat BTree for code that does root[fullpath] = record.  Paths are absolute, a trailing slash is ignored.
+#
+import persistent
+from BTrees import OOBTree
+from BTrees.Length import Length
+from record import _intern
+
+def split(path):
+    # '/usr/bin/' -> ['usr', 'bin'], '/' -> []
+    path = path.rstrip('/')
+    if path.startswith('/'):
+        path = path[1:]
+    if path == '':
+        return []
+    return path.split('/')
+
+def join(parts):
+    return '/' + '/'.join(parts)
+
+class Folder(persistent.Persistent):
+    def __init__(self, record=None):
+        # The record for the folder itself -- None if we've only seen things inside it so far.
+        self.record = record
+        # name -> Folder, or the Record for a file
+        self.children = OOBTree.OOBTree()
+
+class PathIndex(persistent.Persistent):
+    def __init__(self):
+        self.top = Folder()
+        self.count = Length()
+
+    def _folder(self, parts, create=False):
+        # Walks down to the Folder for parts, returns None if it isn't there (or makes it if create is set).
+        node = self.top
+        for name in parts:
+            child = node.children.get(name)
+            if not isinstance(child, Folder):
+                if not create:
+                    return None
+                # Something that used to be a file is a folder now.
+                if child is not None:
+                    self.count.change(-1)
+                child = Folder()
+                node.children[_intern(name)] = child
+            node = child
+        return node
+
+    def __setitem__(self, path, record):
+        parts = split(path)
+        if getattr(record, 'folder', False):
+            node = self._folder(parts, create=True)
+            if node.record is None:
+                self.count.change(1)
+            node.record = record
+            return
+        if not parts:
+            raise KeyError(path)
+        node = self._folder(parts[:-1], create=True)
+        old = node.children.get(parts[-1])
+        if old is None:
+            self.count.change(1)
+        elif isinstance(old, Folder):
+            # A folder got replaced by a file, everything under it is gone.
+            self.count.change(1 - len(list(self._walk(old, parts))))
+        node.children[_intern(parts[-1])] = record
+
+    def get(self, path, default=None):
+        parts = split(path)
+        node = self._folder(parts[:-1])
+        if node is None:
+            return default
+        if not parts:
+            child = node
+        else:
+            child = node.children.get(parts[-1])
+        if isinstance(child, Folder):
+            child = child.record
+        if child is None:
+            return default
+        return child
+
+    def __getitem__(self, path):
+        record = self.get(path)
+        if record is None:
+            raise KeyError(path)
+        return record
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    has_key = __contains__
+
+    def __delitem__(self, path):
+        parts = split(path)
+        if not parts:
+            raise KeyError(path)
+        node = self._folder(parts[:-1])
+        if node is None or parts[-1] not in node.children:
+            raise KeyError(path)
+        child = node.children[parts[-1]]
+        if isinstance(child, Folder):
+            self.count.change(-len(list(self._walk(child, parts))))
+        else:
+            self.count.change(-1)
+        del node.children[parts[-1]]
+
+    def __len__(self):
+        return self.count()
+
+    def children(self, path):
+        # (name, record) for everything directly inside path.  Folders we've only seen the inside of come back as None.
+        node = self._folder(split(path))
+        if node is None:
+            return
+        for name, child in node.children.iteritems():
+            if isinstance(child, Folder):
+                child = child.record
+            yield name, child
+
+    def subtree(self, path):
+        # (fullpath, record) for path and everything under it, depth first, folders before what's inside them.
+        parts = split(path)
+        node = self._folder(parts)
+        if node is not None:
+            for item in self._walk(node, parts):
+                yield item
+        elif parts:
+            # It's a file, the subtree is just itself.
+            record = self.get(path)
+            if record is not None:
+                yield join(parts), record
+
+    def parent(self, path):
+        # Record of the folder path is in, None for / or if we never stored that folder.
+        parts = split(path)
+        if not parts:
+            return None
+        node = self._folder(parts[:-1])
+        if node is None:
+            return None
+        return node.record
+
+    def _walk(self, node, parts):
+        if node.record is not None:
+            yield join(parts), node.record
+        for name, child in node.children.iteritems():
+            if isinstance(child, Folder):
+                for item in self._walk(child, parts + [name]):
+                    yield item
+            else:
+                yield join(parts + [name]), child
+
+    # The old flat-BTree interface
+    def iteritems(self):
+        return self._walk(self.top, [])
+
+    def items(self):
+        return list(self.iteritems())
+
+    def keys(self):
+        return [path for path, record in self.iteritems()]
+
+    def values(self):
+        return [record for path, record in self.iteritems()]
+
+    def __iter__(self):
+        for path, record in self.iteritems():
+            yield path
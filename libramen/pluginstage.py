@@ -0,0 +1,123 @@
+#!/usr/bin/python
+#
+#
+#           PluginStage.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   PluginStage.py runs the actions and extensions in their own pool of processes so a plugin reading a 10GB file doesn't
+#   stall the directory walk.  Scanner processes drop records on a bounded queue and go back to walking -- when the plugins
+#   fall behind the queue fills up and the scanners wait, so nothing piles up in memory.  Finished records go on to the writer.
+#
+import multiprocessing
+import Queue
+import signal
+import threading
+import time
+import traceback
+import settings
+import utils
+
+class PluginStage:
+    # runmodules - callable(fileobj, filesystem) that runs every plugin on a record
+    # writer - writer.Writer the finished records are handed to
+    def __init__(self, targets, runmodules, writer, workers=None, size=None):
+        self.runmodules = runmodules
+        self.writer = writer
+        self.workers = workers if workers is not None else getattr(settings, 'PLUGIN_WORKERS', 4)
+        self.targets = {}
+        for target in targets:
+            self.targets[(target.host, target.filesystem.product)] = target
+        self.queue = multiprocessing.Queue(size or getattr(settings, 'PLUGIN_QUEUE', 1000))
+        self.processes = {}
+        self.running = False
+        self.watcher = None
+        # Set on ctrl-c, workers drop whatever is left in the queue.
+        self.stopping = multiprocessing.Event()
+
+    def put(self, target, fullpath, fileobj, folder):
+        # folder is the scheduler job the record came from, the writer needs it for checkpointing.
+        if not self.workers:
+            # No pool, run them right here like we used to.
+            self.runmodules(fileobj, target.filesystem)
+            self.writer.put(target, fullpath, fileobj, folder)
+            return
+        self.queue.put(((target.host, target.filesystem.product), fullpath, fileobj, folder))
+
+    def start(self):
+        self.running = True
+        for slot in xrange(self.workers):
+            self.spawn(slot)
+        if self.workers:
+            self.watcher = threading.Thread(target=self.monitor)
+            self.watcher.daemon = True
+            self.watcher.start()
+
+    def spawn(self, slot):
+        p = multiprocessing.Process(target=self.worker, args=(slot,))
+        p.start()
+        self.processes[slot] = p
+
+    def monitor(self):
+        # If a plugin takes a worker down with it, start another one so the scanners don't block on a full queue forever.
+        while self.running:
+            for slot, p in self.processes.items():
+                if self.running and p.exitcode is not None:
+                    print "Restarting dead plugin worker"
+                    p.join(3)
+                    self.spawn(slot)
+            time.sleep(0.5)
+
+    def stop(self):
+        # Waits for everything that's queued to make it through the plugins.
+        self.running = False
+        for slot in self.processes:
+            self.queue.put(None)
+        for p in self.processes.values():
+            p.join()
+
+    def abort(self, timeout=5):
+        # ctrl-c -- unlike stop() we don't wait for the queue to empty, the folders those records came from were never marked
+        # walked so --resume redoes them.  A plugin still busy after timeout seconds gets killed.
+        self.running = False
+        self.stopping.set()
+        if self.watcher is not None:
+            # It's a daemon, but one still asleep when the interpreter shuts down dies noisily.
+            self.watcher.join()
+        # Nothing's reading the queue any more, don't hang on exit trying to flush our sentinels into it.
+        self.queue.cancel_join_thread()
+        for slot in self.processes:
+            try:
+                self.queue.put_nowait(None)
+            except Queue.Full:
+                # Then nobody's waiting on an empty queue either.
+                break
+        deadline = time.time() + timeout
+        for p in self.processes.values():
+            p.join(max(0, deadline - time.time()))
+        for p in self.processes.values():
+            if p.is_alive():
+                p.terminate()
+                p.join()
+
+    def worker(self, slot):
+        # ctrl-c is handled by the main process, which tells us to stop.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # Each worker gets its own session for targets that have one (see utils.reopen), so plugins can open() files.
+        local = {}
+        while 1:
+            job = self.queue.get()
+            if job is None or self.stopping.is_set():
+                break
+            key, fullpath, fileobj, folder = job
+            target = local.get(key)
+            if target is None:
+                target = local[key] = utils.reopen(self.targets[key])
+            try:
+                self.runmodules(fileobj, target.filesystem)
+            except Exception:
+                print "Plugins failed on " + fullpath
+                print traceback.format_exc()
+            self.writer.put(target, fullpath, fileobj, folder)
@@ -0,0 +1,194 @@
+#!/usr/bin/python
+#
+#
+#           Query.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   Query.py pulls records back out of the scan database.  Everything is a generator so a query over millions of
+#   records never holds more than one of them at a time.  If the question can be answered from the secondary indexes
+#   (see indexes.py) those are used, a path glob with a fixed folder in front only walks that part of the tree,
+#   and anything else falls back to walking the whole root.
+#
+import binascii
+import csv
+import fnmatch
+import hashlib
+import json
+import string
+import indexes
+
+FIELDS = ['host', 'product', 'path', 'filename', 'folder', 'size', 'mtime', 'mode', 'uid', 'gid', 'scan_date', 'hash', 'attrs', 'deleted']
+# Names and paths -- always text, whatever bytes the server sent.
+TEXT = set(['host', 'product', 'path', 'filename'])
+# Raw digests, always hex.  The hashing plugin stores them in attrs under the algorithm name (md5_sampled... for partial ones).
+DIGESTS = set(['hash']) | set(hashlib.algorithms)
+
+class Query:
+    # Every criteria is optional, anything left as None matches everything.
+    #   host, product - exact target host / filesystem name
+    #   glob - fnmatch pattern against the full path ('/home/*/*.pst')
+    #   ext - extension or list of extensions
+    #   min_size, max_size - bytes, inclusive
+    #   after, before - mtime in epoch seconds, inclusive
+    #   hash - hex or raw digest
+    #   attrs - {name: value} of anything else a plugin stored on the record
+    def __init__(self, host=None, product=None, glob=None, ext=None, min_size=None, max_size=None,
+                 after=None, before=None, hash=None, attrs=None, folders=False, deleted=False):
+        self.host = host
+        self.product = product
+        self.glob = glob
+        self.ext = ext
+        if isinstance(ext, basestring):
+            self.ext = [ext]
+        if self.ext is not None:
+            self.ext = [one.lower().lstrip('.') for one in self.ext]
+        self.min_size = min_size
+        self.max_size = max_size
+        self.after = after
+        self.before = before
+        self.hash = hash
+        self.attrs = attrs or {}
+        # Folders have no extension/size worth talking about, leave them out unless asked.
+        self.folders = folders
+        # Tombstones from incremental rescans (see snapshot.py) -- things that were there once but aren't any more.
+        self.deleted = deleted
+
+    def hashes(self):
+        # The hashes plugin stores raw digests, people type hex.  Accept either.
+        if self.hash is None:
+            return None
+        found = [self.hash]
+        try:
+            found.append(binascii.unhexlify(self.hash))
+        except (TypeError, ValueError):
+            pass
+        return found
+
+    def prefix(self):
+        # The part of the glob before the first wildcard, cut back to a whole folder.
+        if self.glob is None:
+            return '/'
+        for i, char in enumerate(self.glob):
+            if char in '*?[':
+                return self.glob[:i].rsplit('/', 1)[0] or '/'
+        return self.glob
+
+    def candidates(self, filesystem):
+        # (path, record) pairs worth checking -- from the indexes if we can, otherwise a lazy walk.
+        root = filesystem.root
+        hashes = self.hashes()
+        indexable = self.ext is not None or hashes is not None or self.min_size is not None or \
+            self.max_size is not None or self.after is not None or self.before is not None
+        # Tombstones aren't in the indexes.
+        if indexable and not self.folders and not self.deleted:
+            for one in (hashes or [None]):
+                paths = indexes.find(filesystem, ext=self.ext, min_size=self.min_size, max_size=self.max_size,
+                                     after=self.after, before=self.before, hash=one)
+                for path in paths:
+                    record = root.get(path)
+                    if record is not None:
+                        yield path, record
+            return
+        if hasattr(root, 'subtree'):
+            for item in root.subtree(self.prefix()):
+                yield item
+        else:
+            # un-migrated flat BTree
+            for item in root.iteritems():
+                yield item
+
+    def matches(self, path, record):
+        if record.folder and not self.folders:
+            return False
+        if getattr(record, 'deleted', None) is not None and not self.deleted:
+            return False
+        if self.glob is not None and not fnmatch.fnmatchcase(path, self.glob):
+            return False
+        if self.ext is not None and indexes.extension(record.filename) not in self.ext:
+            return False
+        if self.min_size is not None and (record.size is None or record.size < self.min_size):
+            return False
+        if self.max_size is not None and (record.size is None or record.size > self.max_size):
+            return False
+        if self.after is not None and (record.mtime is None or record.mtime < self.after):
+            return False
+        if self.before is not None and (record.mtime is None or record.mtime > self.before):
+            return False
+        if self.hash is not None and getattr(record, 'hash', None) not in self.hashes():
+            return False
+        for name, value in self.attrs.items():
+            if not same(name, attribute(record, name), value):
+                return False
+        return True
+
+    def run(self, db):
+        # Yields (host, product, path, record) for everything in db that matches.
+        hosts = [self.host] if self.host is not None else list(db.keys())
+        for host in hosts:
+            if not db.has_key(host):
+                continue
+            filesystems = db[host].filesystems
+            products = [self.product] if self.product is not None else list(filesystems.keys())
+            for product in products:
+                if product not in filesystems:
+                    continue
+                for path, record in self.candidates(filesystems[product]):
+                    if self.matches(path, record):
+                        yield host, product, path, record
+
+def attribute(record, name):
+    # Looks in the record's fields, then whatever plugins put in attrs.
+    if name in FIELDS and hasattr(record, name):
+        return getattr(record, name)
+    attrs = getattr(record, 'attrs', None) or {}
+    return attrs.get(name)
+
+def same(name, actual, wanted):
+    # Values from the command line are always strings, compare them to what the results would show.
+    if actual == wanted:
+        return True
+    return isinstance(wanted, basestring) and actual is not None and unicode(printable(name, actual)) == text(wanted)
+
+def text(value):
+    # Paths are usually UTF-8 but nothing makes a server stick to it, one bad name shouldn't stop the export.
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    return value
+
+def printable(name, value):
+    # How a field comes out in the results -- unicode for text, hex for digests and anything else that isn't text.
+    if not isinstance(value, str) or name in TEXT:
+        return text(value)
+    if name not in DIGESTS and name.rsplit('_', 1)[0] not in hashlib.algorithms:
+        try:
+            decoded = value.decode('utf-8')
+        except UnicodeDecodeError:
+            decoded = None
+        if decoded is not None and all(char in string.printable for char in value if ord(char) < 128):
+            return decoded
+    return binascii.hexlify(value)
+
+def row(host, product, path, record):
+    result = {'host':text(host), 'product':text(product), 'path':text(path)}
+    for name in FIELDS[3:]:
+        result[name] = printable(name, getattr(record, name, None))
+    if result['attrs']:
+        result['attrs'] = dict((key, printable(key, value)) for key, value in result['attrs'].items())
+    return result
+
+def write_json(results, out):
+    # One JSON object per line.
+    for result in results:
+        out.write(json.dumps(row(*result), default=repr) + '\n')
+
+def write_csv(results, out):
+    writer = csv.writer(out)
+    writer.writerow(FIELDS)
+    for result in results:
+        fields = row(*result)
+        if fields['attrs']:
+            fields['attrs'] = json.dumps(fields['attrs'], default=repr)
+        writer.writerow([unicode(fields[name]).encode('utf-8') if fields[name] is not None else '' for name in FIELDS])
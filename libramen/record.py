@@ -0,0 +1,102 @@
+#!/usr/bin/python
+
+##########################
+#       Record.py        #
+#  The compact File(tm)  #
+##########################
+#
+#   What the scanner stores for every file and folder.  Unlike the old file.File this isn't a persistent object of it's own --
+#   records are pickled straight into the BTree buckets of filesystem.root as a plain tuple, so there's no per-file oid
+#   and no copy of the stat tuple or the target in every one of them.
+#
+import time
+
+# Hosts, products and folder paths repeat for every file, keep one copy of each around.
+_interned = {}
+
+def _intern(value):
+    if value is None:
+        return None
+    return _interned.setdefault(value, value)
+
+def _statfield(stat, name, index):
+    # os.stat_result and ftputil's StatResult have the st_ names (and the float times), other handlers just hand back a tuple.
+    if stat is None:
+        return None
+    try:
+        return getattr(stat, name)
+    except AttributeError:
+        try:
+            return stat[index]
+        except (IndexError, TypeError):
+            return None
+
+class Record(object):
+    __slots__ = ('filename', 'relpath', 'host', 'product', 'folder', 'scan_date',
+                 'mode', 'size', 'mtime', 'uid', 'gid', 'hash', 'attrs', 'deleted')
+
+    # Same signature file.File always had so the scanner and plugins don't care which one they get.
+    def __init__(self, filename, relpath, stat, target, folder=False):
+        self.filename = filename
+        # path of the folder this is in
+        self.relpath = _intern(relpath)
+        self.host = _intern(target.host)
+        self.product = _intern(target.filesystem.product)
+        # bool that sets if this is a folder or not.
+        self.folder = folder
+        # simplest - just takes the time right now
+        self.scan_date = int(time.time())
+        self.setstat(stat)
+        # plugin results -- hash has it's own field, anything else a plugin wants to keep goes in attrs.
+        self.hash = None
+        self.attrs = None
+        # When an incremental rescan found it gone (see snapshot.py), None while it's still there.
+        self.deleted = None
+
+    def setstat(self, stat):
+        self.mode = _statfield(stat, 'st_mode', 0)
+        self.uid = _statfield(stat, 'st_uid', 4)
+        self.gid = _statfield(stat, 'st_gid', 5)
+        self.size = _statfield(stat, 'st_size', 6)
+        self.mtime = _statfield(stat, 'st_mtime', 8)
+
+    @property
+    def stat(self):
+        # Enough of an os.stat() tuple for old code -- the fields we don't keep are None.
+        return (self.mode, None, None, None, self.uid, self.gid, self.size, None, self.mtime, None)
+
+    def __getstate__(self):
+        return (self.filename, self.relpath, self.host, self.product, self.folder, self.scan_date,
+                self.mode, self.size, self.mtime, self.uid, self.gid, self.hash, self.attrs, self.deleted)
+
+    def __setstate__(self, state):
+        # Records saved before tombstones existed are one field shorter.
+        if len(state) == 13:
+            state = state + (None,)
+        (self.filename, relpath, host, product, self.folder, self.scan_date,
+         self.mode, self.size, self.mtime, self.uid, self.gid, self.hash, self.attrs, self.deleted) = state
+        self.relpath = _intern(relpath)
+        self.host = _intern(host)
+        self.product = _intern(product)
+
+    @classmethod
+    def from_file(cls, fileobj, host, product):
+        # Converts an old persistent file.File (see migrate.py)
+        record = cls.__new__(cls)
+        record.filename = fileobj.filename
+        record.relpath = _intern(fileobj.relpath)
+        record.host = _intern(host)
+        record.product = _intern(product)
+        record.folder = fileobj.folder
+        record.scan_date = fileobj.scan_date
+        record.setstat(fileobj.stat)
+        record.hash = getattr(fileobj, 'hash', None)
+        # Whatever else plugins hung off the old object.
+        extra = dict((key, value) for key, value in fileobj.__dict__.items()
+                     if key not in ('filename', 'relpath', 'target', 'stat', 'folder', 'scan_date', 'hash'))
+        record.attrs = extra or None
+        record.deleted = None
+        return record
+
+    def tostring(self):
+        return self.stat
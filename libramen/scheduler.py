@@ -0,0 +1,173 @@
+#!/usr/bin/python
+#
+#
+#           Scheduler.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   Scheduler.py hands out work to the scanner processes.  The unit of work is a (target, directory) pair instead of a whole target,
+#   so a worker that finishes early picks up subdirectories that other workers discovered instead of sitting idle while one process walks one giant tree.
+#   Each host gets a cap on how many workers may be inside it at once so we don't hammer a single server.  Jobs for a host that's
+#   at it's cap wait here in the main process, the workers only ever get handed something they can start on right away.
+#
+import collections
+import multiprocessing
+import multiprocessing.managers
+import Queue
+import signal
+import time
+import traceback
+import settings
+import utils
+
+class Scheduler:
+    # targets - list of target objects (see targeting.py)
+    # scanjob - callable(target, path, stat) that scans one directory and returns (full path, stat) for the subdirectories it found.
+    #           stat is what the parent's listing said about the folder, None if we don't know.
+    # finish - optional callable run by each worker right before it exits
+    # frontier - optional {(host, product): [paths]} to start from instead of / (see checkpoint.py)
+    def __init__(self, targets, scanjob, finish=None, workers=None, per_host=None, frontier=None):
+        self.targets = targets
+        self.frontier = frontier or {}
+        self.scanjob = scanjob
+        self.finish = finish
+        self.workers = workers or settings.MAX_THREADS
+        self.per_host = per_host or getattr(settings, 'MAX_PER_HOST', self.workers)
+
+        # Jobs are (index into self.targets, path, stat) so we aren't pickling the whole target (and it's connections) for every directory.
+        self.queue = multiprocessing.Queue()
+        # Workers send back (index, subdirs) when they finish a job.
+        self.results = multiprocessing.Queue()
+        # host -> jobs waiting for a free slot, and how many of the host's jobs are on the queue or being worked on.
+        # Only the main process touches these.
+        self.waiting = collections.OrderedDict()
+        self.busy = {}
+        for target in targets:
+            if target.host not in self.waiting:
+                self.waiting[target.host] = collections.deque()
+                self.busy[target.host] = 0
+
+        # Set on ctrl-c, workers finish the directory they're on and go home.
+        self.stopping = multiprocessing.Event()
+
+        # Tracks which job each worker is on so a job can be handed out again if the worker segfaults.
+        # The manager's process would catch ctrl-c too and take the dict down with it before the workers are done.
+        self.manager = multiprocessing.managers.SyncManager()
+        self.manager.start(signal.signal, (signal.SIGINT, signal.SIG_IGN))
+        self.inflight = self.manager.dict()
+        self.processes = {}
+
+    def put(self, index, path, stat=None):
+        self.waiting[self.targets[index].host].append((index, path, stat))
+
+    def dispatch(self):
+        # Hand out whatever the per-host caps allow, a job per host at a time so one giant host can't crowd out the rest.
+        moved = True
+        while moved:
+            moved = False
+            for host, jobs in self.waiting.items():
+                if jobs and self.busy[host] < self.per_host:
+                    self.queue.put(jobs.popleft())
+                    self.busy[host] += 1
+                    moved = True
+
+    def outstanding(self):
+        # Number of jobs that are waiting, queued or being worked on.  We're done when this hits 0.
+        return sum(self.busy.values()) + sum(len(jobs) for jobs in self.waiting.values())
+
+    def run(self):
+        for index, target in enumerate(self.targets):
+            # We should always start with the root - / (unless we're resuming, and a finished target has nothing left at all)
+            for path in self.frontier.get((target.host, target.filesystem.product), ['/']):
+                self.put(index, path)
+
+        for slot in xrange(self.workers):
+            self.start(slot)
+
+        self.dispatch()
+        while self.outstanding() > 0:
+            # Handles dead processes in a way that is more resiliant to errors than mapped pools, which can fail on python segfaults.
+            for slot, p in self.processes.items():
+                if p.exitcode is not None:
+                    print "Restarting dead worker -- " + str(self.outstanding()) + " More jobs left"
+                    p.join(3)
+                    self.requeue(slot)
+                    self.start(slot)
+            try:
+                index, subdirs = self.results.get(True, 0.5)
+            except Queue.Empty:
+                continue
+            self.busy[self.targets[index].host] -= 1
+            for subdir, stat in subdirs:
+                self.put(index, subdir, stat)
+            self.dispatch()
+
+        # Tell everyone to go home.
+        for slot in self.processes:
+            self.queue.put(None)
+        for p in self.processes.values():
+            p.join()
+        self.manager.shutdown()
+
+    def stop(self, timeout=5):
+        # Called from the main process on ctrl-c.  Anyone still busy after timeout seconds (stuck on a full plugin queue,
+        # a huge folder...) gets killed -- their folders were never marked walked, so --resume does them again.
+        self.stopping.set()
+        # Jobs nobody is going to pick up any more, don't hang on exit trying to flush them.
+        self.queue.cancel_join_thread()
+        deadline = time.time() + timeout
+        for p in self.processes.values():
+            p.join(max(0, deadline - time.time()))
+        for p in self.processes.values():
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        self.manager.shutdown()
+
+    def start(self, slot):
+        p = multiprocessing.Process(target=self.worker, args=(slot,))
+        p.start()
+        self.processes[slot] = p
+
+    def requeue(self, slot):
+        # Give the job the dead worker was holding to somebody else.
+        job = self.inflight.pop(slot, None)
+        if job is not None:
+            host = self.targets[job[0]].host
+            self.busy[host] -= 1
+            self.waiting[host].appendleft(job)
+            self.dispatch()
+
+    def worker(self, slot):
+        # ctrl-c is handled by the main process, which tells us to stop.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # Each worker gets its own session for targets that have one (see utils.reopen).
+        local = {}
+        # Cute little naming trick for debug only.
+        name = slot
+        while not self.stopping.is_set():
+            try:
+                job = self.queue.get(True, 1)
+            except Queue.Empty:
+                continue
+            if job is None:
+                break
+
+            index, path, stat = job
+            self.inflight[slot] = job
+            subdirs = []
+            try:
+                if index not in local:
+                    local[index] = utils.reopen(self.targets[index])
+                subdirs = list(self.scanjob(local[index], path, stat))
+            except Exception:
+                print str(name) + ": we encountered an error scanning " + path + " on " + self.targets[index].host
+                print traceback.format_exc()
+            self.results.put((index, subdirs))
+            del self.inflight[slot]
+
+        if self.finish is not None:
+            self.finish()
+        print str(name) + ": Gave up looking for work - dying"
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+#
+#
+#           Snapshot.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   Snapshot.py is a read-only look at the database as it was when a scanner process started, for incremental rescans.
+#   Scanners compare every folder listing against what the last scan stored and only send on what's new or changed, and
+#   whatever disappeared gets a tombstone.  Handlers that set prune_dirs don't even get listed when the folder's own
+#   mtime and link count say nothing in it was added, removed or renamed.  The writer still owns the real connection -- a read-only FileStorage doesn't
+#   take the lock, so every scanner can have one of these.
+#
+import os
+import traceback
+import settings
+from record import _statfield
+
+class Snapshot:
+    def __init__(self, path=None):
+        import ZODB, ZODB.FileStorage
+        self.path = path or getattr(settings, 'DATABASE', 'data/mydata.fs')
+        self.storage = ZODB.FileStorage.FileStorage(self.path, read_only=True)
+        self.db_c = ZODB.DB(self.storage)
+        self.connection = self.db_c.open()
+        self.db = self.connection.root()
+
+    def root(self, host, product):
+        # The file tree from the last scan of this target, None if it was never scanned.
+        if not self.db.has_key(host):
+            return None
+        filesystems = self.db[host].filesystems
+        if not filesystems.has_key(product):
+            return None
+        return filesystems[product].root
+
+    def get(self, host, product, path):
+        # The record stored for path last time, or None.
+        root = self.root(host, product)
+        if root is None:
+            return None
+        return root.get(path)
+
+    def children(self, host, product, path):
+        # {name: record} for everything stored directly inside path last time.  None if we don't know anything about path.
+        root = self.root(host, product)
+        if root is None or not hasattr(root, 'children'):
+            # Never scanned, or an un-migrated flat BTree (see migrate.py) -- scan it all.
+            return None
+        found = dict(root.children(path))
+        # Scanners live a long time, don't let them keep every folder they've compared.
+        self.connection.cacheGC()
+        if not found and root.get(path) is None:
+            return None
+        return found
+
+    def close(self):
+        self.connection.close()
+        self.db_c.close()
+
+# One per process -- the scanners are forked and can't share a file handle.
+_snapshots = {}
+
+def get():
+    pid = os.getpid()
+    if pid not in _snapshots:
+        _snapshots.clear()
+        try:
+            _snapshots[pid] = Snapshot()
+        except:
+            print "Couldn't open the database read-only, scanning everything"
+            print traceback.format_exc()
+            _snapshots[pid] = None
+    return _snapshots[pid]
+
+def children(target, path):
+    snapshot = get()
+    if snapshot is None:
+        return None
+    try:
+        return snapshot.children(target.host, target.filesystem.product, path)
+    except:
+        print "Snapshot lookup failed on " + path
+        print traceback.format_exc()
+        return None
+
+def record(target, path):
+    snapshot = get()
+    if snapshot is None:
+        return None
+    try:
+        return snapshot.get(target.host, target.filesystem.product, path)
+    except:
+        print "Snapshot lookup failed on " + path
+        print traceback.format_exc()
+        return None
+
+def nlink(record):
+    # Folder records keep the link count (2 + how many subfolders on unix) so we can tell if the folder changed without listing it.
+    return (getattr(record, 'attrs', None) or {}).get('nlink')
+
+def changed(old, new):
+    # True if new has to be stored (and go through the plugins) again.
+    if old is None or getattr(old, 'deleted', None) is not None:
+        return True
+    if bool(old.folder) != bool(new.folder):
+        return True
+    if new.folder and nlink(old) != nlink(new):
+        return True
+    return old.size != new.size or old.mtime != new.mtime or old.mode != new.mode
+
+def unchanged(target, path, stat):
+    # If the folder at path has the same mtime and link count as last scan its list of entries hasn't changed, so there's no
+    # need to list it again.  Returns the subfolders last scan found in it to keep walking, or None if it has to be listed.
+    # Files in it that were rewritten in place don't touch the folder's mtime -- that's what prune_dirs trades away.
+    old = record(target, path)
+    if old is None or not old.folder or getattr(old, 'deleted', None) is not None or nlink(old) is None:
+        return None
+    mtime = _statfield(stat, 'st_mtime', 8)
+    if mtime is None or mtime != old.mtime or _statfield(stat, 'st_nlink', 3) != nlink(old):
+        return None
+    found = children(target, path)
+    if found is None:
+        return None
+    if path[-1] != '/':
+        path = path + '/'
+    # A child with no record is a folder we only ever saw the inside of.
+    return [path + name for name, child in sorted(found.items())
+            if child is None or (child.folder and getattr(child, 'deleted', None) is None)]
@@ -1,4 +1,8 @@
-import settings,socket,os,struct
+import settings,socket,os,struct,copy
+import threading
+import Queue
+import traceback
+import dispatch
 from subprocess import call
 import pdb
 
@@ -34,6 +38,94 @@ def umount(location):
         return False
     return True
 
+def stat_many(filesystem,dirpath,names):
+    # Use the handler's batched stat if it has one, otherwise one stat() per name.
+    if hasattr(filesystem,'stat_many'):
+        return filesystem.stat_many(dirpath,names)
+    if dirpath[-1] != '/':
+        dirpath = dirpath+'/'
+    return [filesystem.stat(dirpath+name) for name in names]
+
+def reopen(target):
+    # The target a worker process should scan with.  Handlers with a connection (ftp) have a reopen() that hands back a copy
+    # with it's own session -- the live one can't be shared between processes or deepcopied.  Everything else is used as is.
+    if not hasattr(target.filesystem,'reopen'):
+        return target
+    local = copy.copy(target)
+    local.filesystem = target.filesystem.reopen()
+    return local
+
+def parallel_walk(top,listdir,workers,join,connect=None,close=None):
+    # Walks the tree with workers threads listing folders at the same time.  On network filesystems every listing is a round trip,
+    # so we want a bunch of them in flight instead of waiting on one at a time.  Yields (dirpath, dirs, files, entries) in whatever
+    # order they finish, not top-down, and pruning dirs in place does nothing.
+    #   listdir - callable(state, path) returning (dirs, files, entries) for one folder.  Links to folders belong in files so we don't walk in circles.
+    #   join - how the handler glues a folder and a name together
+    #   connect/close - per thread state for listdir (a logged-in session...), made the first time the thread needs it.
+    todo = Queue.Queue()
+    # Bounded so the listers can't get too far ahead of whoever is consuming this.
+    done = Queue.Queue(workers*4)
+
+    # Set when the consumer walks away early so the listers quit instead of waiting on a done queue nobody reads.
+    stop = threading.Event()
+
+    def lister():
+        state = None
+        try:
+            while not stop.is_set():
+                dirpath = todo.get()
+                if dirpath is None:
+                    break
+                try:
+                    if state is None and connect is not None:
+                        state = connect()
+                    listing = listdir(state,dirpath)
+                except OSError:
+                    # Permission denied and friends, nothing to say.
+                    listing = None
+                except Exception:
+                    # Anything else still has to post a result or the consumer waits on done forever.
+                    print traceback.format_exc()
+                    listing = None
+                done.put((dirpath,listing))
+        finally:
+            if state is not None and close is not None:
+                try:
+                    close(state)
+                except Exception:
+                    pass
+
+    pool = [threading.Thread(target=lister) for i in xrange(workers)]
+    for thread in pool:
+        # Don't hang the process on exit if the consumer walks away early.
+        thread.daemon = True
+        thread.start()
+
+    todo.put(top)
+    outstanding = 1
+    try:
+        while outstanding > 0:
+            dirpath,listing = done.get()
+            outstanding -= 1
+            if listing is None:
+                continue
+            dirs,files,entries = listing
+            # Queue up the children before handing this one out so the pool stays busy.
+            for name in dirs:
+                todo.put(join(dirpath,name))
+                outstanding += 1
+            yield dirpath,dirs,files,entries
+    finally:
+        stop.set()
+        for thread in pool:
+            todo.put(None)
+        # Listers blocked on a full done queue need the room to finish their put, see the stop flag and clean up.
+        while [thread for thread in pool if thread.is_alive()]:
+            try:
+                done.get(True,0.1)
+            except Queue.Empty:
+                pass
+
 def loadmodules(folder):
     dirs = os.listdir(folder)
     # recursive load any subdirectories
@@ -64,3 +156,7 @@ def loadmodules(folder):
                 function_array.append(funct)
     # Return an array of loaded module objects
     return function_array
+
+def loadextensions(folder):
+    # Extensions get compiled into one dispatch table (see dispatch.py) so we aren't calling every __match__ on every file.
+    return dispatch.Dispatcher(loadmodules(folder))
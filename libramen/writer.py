@@ -0,0 +1,192 @@
+#!/usr/bin/python
+#
+#
+#           Writer.py
+#
+#       A Part of Project Ramen
+#
+#
+#
+#   Writer.py is the only thing that talks to the ZODB during a scan.  Scanner processes stream File records to it over a queue
+#   and it commits them in batches, so workers don't each hold their own copy of the tree until the end and we don't get conflict errors at commit time.
+#
+import copy
+import multiprocessing
+import Queue
+import signal
+import time
+import traceback
+import settings
+import indexes
+import history
+
+class Writer:
+    # targets - list of target objects being scanned, used the first time we see a host/filesystem combo that isn't in the db yet.
+    # checkpoint - optional checkpoint.Checkpoint that gets saved after commits.
+    # run - history run id (see history.py), defaults to the checkpoint's so a --resume is the same run.
+    def __init__(self, targets, path=None, batch=None, interval=None, checkpoint=None, run=None):
+        self.path = path or getattr(settings, 'DATABASE', 'data/mydata.fs')
+        # Commit after this many records or this many seconds, whichever comes first.
+        self.batch = batch or getattr(settings, 'COMMIT_BATCH', 1000)
+        self.interval = interval or getattr(settings, 'COMMIT_INTERVAL', 30)
+        self.checkpoint = checkpoint
+        if run is None:
+            run = checkpoint.run if checkpoint is not None else int(time.time())
+        # Not self.run, that's the writer process.
+        self.run_id = run
+        self.targets = {}
+        for target in targets:
+            self.targets[(target.host, target.filesystem.product)] = target
+            if checkpoint is not None:
+                checkpoint.start((target.host, target.filesystem.product))
+        # Bounded so a slow disk makes the workers wait instead of eating all the memory.
+        self.queue = multiprocessing.Queue(getattr(settings, 'WRITER_QUEUE', 10000))
+        self.process = None
+
+    def start(self):
+        self.process = multiprocessing.Process(target=self.run)
+        self.process.start()
+
+    # folder - the scheduler job (see scheduler.py) this record came out of
+    def put(self, target, fullpath, fileobj, folder=None):
+        self.queue.put(('file', target.host, target.filesystem.product, fullpath, fileobj, folder))
+
+    def deleted(self, target, fullpath):
+        # An incremental rescan didn't find fullpath any more -- it and everything under it get tombstoned.
+        self.queue.put(('deleted', target.host, target.filesystem.product, fullpath, int(time.time())))
+
+    def walked(self, target, path, subdirs, count):
+        # Marks a job as done once all count of it's records have been committed.  They can show up after this does
+        # since they take the long way through the plugin stage.
+        self.queue.put(('walked', target.host, target.filesystem.product, path, subdirs, count))
+
+    def stop(self):
+        # Flushes whatever is left and waits for the final commit.
+        if self.process is None:
+            return
+        self.queue.put(None)
+        self.process.join()
+        self.process = None
+
+    def getfilesystem(self, db, host, product):
+        #determine if this target/fs combo exists already
+        if db.has_key(host):
+            if db[host].filesystems.has_key(product):
+                # we already have the object scanned -- get the writeable root and start writing on top of it.
+                pass
+            else:
+                # we have the target, but not the fs
+                db[host].filesystems[product] = self.targets[(host, product)].filesystem
+        else:
+            target = self.targets[(host, product)]
+            target.filesystems = {product:target.filesystem}
+            db[host] = target
+        return db[host].filesystems[product]
+
+    def tombstone(self, store, index, log, fullpath, when):
+        # Keeps the last thing we knew about each path but takes it out of the indexes.  Returns how many were marked.
+        if hasattr(store, 'subtree'):
+            found = list(store.subtree(fullpath))
+        else:
+            found = [(fullpath, store.get(fullpath))]
+        marked = 0
+        for path, old in found:
+            if old is None or getattr(old, 'deleted', None) is not None:
+                continue
+            index.remove(path, old)
+            gone = copy.copy(old)
+            gone.deleted = when
+            log.change(self.run_id, path, old, gone)
+            store[path] = gone
+            marked += 1
+        return marked
+
+    def run(self):
+        # ctrl-c is handled by the main process, which tells us to flush.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        # For DB -- only imported here, this process owns the connection.
+        import ZODB, ZODB.FileStorage
+        import transaction
+
+        print "Loading ZODB storage and connection"
+        storage = ZODB.FileStorage.FileStorage(self.path)
+        db_c = ZODB.DB(storage)
+        connection = db_c.open()
+        db = connection.root()
+
+        stores = {}
+        # Every target gets this run in it's history, even if nothing changed in it.
+        for host, product in self.targets:
+            history.get(self.getfilesystem(db, host, product)).begin(self.run_id, int(time.time()))
+        transaction.commit()
+        # jobs that are finished, waiting on their records to be committed
+        walked = []
+        # (host, product, job) -> records stored so far
+        seen = {}
+        count = 0
+        last_commit = time.time()
+        while 1:
+            try:
+                record = self.queue.get(True, 1)
+            except Queue.Empty:
+                record = False
+
+            if record and record[0] in ('file', 'deleted') and (record[1], record[2]) not in stores:
+                filesystem = self.getfilesystem(db, record[1], record[2])
+                stores[(record[1], record[2])] = (filesystem.w_root, indexes.get(filesystem), history.get(filesystem))
+
+            if record and record[0] == 'file':
+                kind, host, product, fullpath, fileobj, folder = record
+                store, index, log = stores[(host, product)]
+                # Whatever was there before has to come out of the indexes, and goes in the history if it changed.
+                old = store.get(fullpath)
+                index.update(fullpath, old, fileobj)
+                log.change(self.run_id, fullpath, old, fileobj)
+                store[fullpath] = fileobj
+                seen[(host, product, folder)] = seen.get((host, product, folder), 0) + 1
+                count += 1
+            elif record and record[0] == 'deleted':
+                kind, host, product, fullpath, when = record
+                store, index, log = stores[(host, product)]
+                count += self.tombstone(store, index, log, fullpath, when)
+            elif record and record[0] == 'walked':
+                kind, host, product, path, subdirs, expected = record
+                walked.append(((host, product), path, subdirs, expected))
+
+            if record is None:
+                for host, product in self.targets:
+                    history.get(self.getfilesystem(db, host, product)).finish(self.run_id, int(time.time()))
+
+            if record is None or count >= self.batch or ((count > 0 or walked) and time.time() - last_commit >= self.interval):
+                try:
+                    transaction.commit()
+                except:
+                    print "Commit failed, dropping " + str(count) + " records"
+                    print traceback.format_exc()
+                    transaction.abort()
+                    stores = {}
+                    # Those jobs stay in the frontier and get redone on --resume.
+                    walked = []
+                    seen = {}
+                waiting = []
+                for key, path, subdirs, expected in walked:
+                    if seen.get(key + (path,), 0) < expected:
+                        waiting.append((key, path, subdirs, expected))
+                        continue
+                    seen.pop(key + (path,), None)
+                    if self.checkpoint is not None:
+                        self.checkpoint.walk(key, path, subdirs)
+                if self.checkpoint is not None:
+                    self.checkpoint.save(force=record is None)
+                walked = waiting
+                # Don't let the writer hold the whole tree either.
+                connection.cacheMinimize()
+                count = 0
+                last_commit = time.time()
+
+            if record is None:
+                break
+
+        connection.close()
+        db_c.close()
@@ -0,0 +1,58 @@
+#!/usr/bin/python
+
+#
+#   Upgrades a database written by older versions of Ramen:
+#     * old persistent file.File objects become compact record.Record ones
+#     * flat OOBTree roots keyed by full path become pathindex.PathIndex trees
+#     * filesystems without secondary indexes get them built
+#   usage: ./migrate.py [path to .fs file, defaults to settings.DATABASE]
+#
+import sys
+import ZODB, ZODB.FileStorage
+import transaction
+import settings
+from libramen import file, record, pathindex, indexes
+
+path = sys.argv[1] if len(sys.argv) > 1 else settings.DATABASE
+batch = getattr(settings, 'COMMIT_BATCH', 1000)
+
+storage = ZODB.FileStorage.FileStorage(path)
+db_c = ZODB.DB(storage)
+connection = db_c.open()
+db = connection.root()
+
+converted = 0
+for host in db.keys():
+    for product, filesystem in db[host].filesystems.items():
+        print "Converting " + host + " - " + product
+        old = filesystem.root
+        if isinstance(old, pathindex.PathIndex):
+            root = old
+        else:
+            # Hook the new tree up first so the batch commits below save it.
+            root = pathindex.PathIndex()
+            filesystem.root = root
+        # list() the items first, we're rewriting the values as we go.
+        for key, fileobj in list(old.items()):
+            if isinstance(fileobj, file.File):
+                fileobj = record.Record.from_file(fileobj, host, product)
+            elif root is old:
+                continue
+            root[key] = fileobj
+            converted += 1
+            if converted % batch == 0:
+                transaction.commit()
+                # Old File objects are their own db records, don't keep them all in memory.
+                connection.cacheMinimize()
+                print str(converted) + " converted"
+        if getattr(filesystem, 'indexes', None) is None:
+            print "Indexing " + host + " - " + product
+            indexes.rebuild(filesystem)
+transaction.commit()
+print str(converted) + " records converted"
+
+# The old File records are garbage now -- packing is what actually gives the space back.
+print "Packing " + path
+db_c.pack()
+connection.close()
+db_c.close()
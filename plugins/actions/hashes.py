@@ -0,0 +1,152 @@
+#!/usr/bin/python
+#
+# Hashing action -- MD5, SHA-1 and SHA-256 (or whatever HASH_ALGORITHMS says) in one pass over the file.
+#
+# Modes (HASH_MODE in settings.py):
+#   full    - every byte, shares the read with the other content plugins (see libramen/content.py)
+#   sampled - the head, the tail and HASH_SAMPLES blocks spread through the middle.  Good enough to spot duplicates
+#             and changes during triage without pulling terabytes over the wire.
+#   auto    - full for anything up to HASH_FULL_MAX bytes, sampled above that
+#
+# Full digests go in fileobj.attrs under the algorithm name, sampled ones under md5_sampled (or md5_head when the handler
+# can't seek) so search.py --attr md5=... only ever matches a real digest.  'hash_mode' says which you got.
+# fileobj.hash only gets the first algorithm's digest for full hashes -- a sampled hash in the hash index would make
+# two different files look like the same file.
+#
+# Results are kept in the hash cache (libramen/hashcache.py) and reused as long as the file's size and mtime don't change.
+
+import hashlib
+import settings
+from libramen import content
+from libramen import hashcache
+
+ALGORITHMS = getattr(settings, 'HASH_ALGORITHMS', ['md5', 'sha1', 'sha256'])
+MODE = getattr(settings, 'HASH_MODE', 'auto')
+FULL_MAX = getattr(settings, 'HASH_FULL_MAX', 64 * 1024**2)
+SAMPLE_SIZE = getattr(settings, 'HASH_SAMPLE_SIZE', 65536)
+SAMPLES = getattr(settings, 'HASH_SAMPLES', 8)
+
+class hashstream:
+    def __init__(self, fileobj, algorithms=None):
+        self.fileobj = fileobj
+        self.hashes = [(name, hashlib.new(name)) for name in (algorithms or ALGORITHMS)]
+
+    def update(self, chunk):
+        for name, one in self.hashes:
+            one.update(chunk)
+
+    def finalize(self):
+        save(self.fileobj, self.hashes, 'full')
+
+def attr(name, mode):
+    # Where the digest of algorithm name goes for a mode.
+    if mode == 'full':
+        return name
+    return name + '_' + mode
+
+def save(fileobj, hashes, mode):
+    if fileobj.attrs is None:
+        fileobj.attrs = {}
+    if mode != 'full' and fileobj.attrs.get('hash_mode') in ('sampled', 'head'):
+        # The hash cache had this from before sampled digests got their own names, don't leave them looking like full ones.
+        for name, one in hashes:
+            fileobj.attrs.pop(name, None)
+    # keyed by the name from settings, hashlib's own names are upper case on some builds.
+    for name, one in hashes:
+        fileobj.attrs[attr(name, mode)] = one.digest()
+    fileobj.attrs['hash_mode'] = mode
+    if mode == 'full' and hashes:
+        fileobj.hash = hashes[0][1].digest()
+    digests = dict((attr(name, mode), fileobj.attrs[attr(name, mode)]) for name, one in hashes)
+    digests['hash_mode'] = mode
+    hashcache.store(fileobj, digests)
+
+def done(fileobj, mode=None):
+    # True if the cache already gave us what we would have worked out (the plugin runner restores it before we're called).
+    attrs = fileobj.attrs or {}
+    wanted = choose(fileobj, mode)
+    found = attrs.get('hash_mode')
+    if found != wanted and not (wanted == 'sampled' and found == 'head'):
+        return False
+    return not [name for name in ALGORITHMS if attr(name, found) not in attrs]
+
+def choose(fileobj, mode=None):
+    # full or sampled for this file.
+    mode = mode or MODE
+    size = getattr(fileobj, 'size', None)
+    if mode == 'auto':
+        mode = 'full' if size is None or size <= FULL_MAX else 'sampled'
+    if mode == 'sampled' and (size is None or size <= (SAMPLES + 2) * SAMPLE_SIZE):
+        # The samples would cover the whole thing anyway.
+        mode = 'full'
+    return mode
+
+def offsets(size, sample_size=None, samples=None):
+    # Where the sample blocks start: the head, SAMPLES evenly spaced through the middle, and the tail.
+    sample_size = sample_size or SAMPLE_SIZE
+    samples = samples if samples is not None else SAMPLES
+    last = max(size - sample_size, 0)
+    found = [0]
+    for i in xrange(1, samples + 1):
+        found.append(last * i // (samples + 1))
+    found.append(last)
+    return sorted(set(found))
+
+def seekable(file_desc):
+    if not hasattr(file_desc, 'seek'):
+        return False
+    if hasattr(file_desc, 'seekable'):
+        return file_desc.seekable()
+    return True
+
+def sample(fileobj, filesystem, algorithms=None):
+    # Hashes the sample blocks.  The size goes in first so two files that only differ in length don't match.
+    hashes = [(name, hashlib.new(name)) for name in (algorithms or ALGORITHMS)]
+    file_desc = filesystem.open(fileobj.relpath + fileobj.filename)
+    try:
+        for name, one in hashes:
+            one.update(str(fileobj.size))
+        if seekable(file_desc):
+            mode = 'sampled'
+            places = offsets(fileobj.size)
+        else:
+            # Can't seek over FTP/HTTP and reading up to the tail is the whole file again -- the head will have to do.
+            mode = 'head'
+            places = [0]
+        for offset in places:
+            if offset:
+                file_desc.seek(offset)
+            buf = file_desc.read(SAMPLE_SIZE)
+            for name, one in hashes:
+                one.update(buf)
+    finally:
+        if hasattr(file_desc, 'close'):
+            file_desc.close()
+    save(fileobj, hashes, mode)
+
+# Content plugins have a stream method -- the scanner reads each file once and feeds every content plugin the same chunks.
+def stream(fileobj, filesystem):
+    if fileobj.folder == True or done(fileobj):
+        return None
+    if choose(fileobj) == 'full':
+        return hashstream(fileobj)
+    # A handful of seeks isn't worth sharing, do them now and sit out the full read.
+    try:
+        sample(fileobj, filesystem)
+    except:
+        print "Couldn't sample " + fileobj.relpath + fileobj.filename
+    return None
+
+# For running it on its own, the scanner uses stream().
+def action(fileobj, filesystem, mode=None):
+    if fileobj.folder == True:
+        return None
+    hashcache.restore(fileobj)
+    if not done(fileobj, mode):
+        if choose(fileobj, mode) == 'full':
+            content.feed(fileobj, filesystem, [hashstream(fileobj)])
+        else:
+            sample(fileobj, filesystem)
+    found = (fileobj.attrs or {}).get('hash_mode')
+    return dict((attr(name, found), fileobj.attrs[attr(name, found)].encode('hex')) for name in ALGORITHMS
+                if found is not None and attr(name, found) in fileobj.attrs)
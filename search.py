@@ -0,0 +1,90 @@
+#!/usr/bin/python
+
+#
+#   Command line front end for libramen/query.py -- searches the scan database and streams the results out as JSON lines or CSV.
+#
+#   ./search.py --ext pst --after 2014-01-01 --before 2014-03-31
+#   ./search.py --host 10.0.0.5 --product ftp --glob '/pub/*.iso' --min-size 1g --format csv > isos.csv
+#   ./search.py --hash d41d8cd98f00b204e9800998ecf8427e
+#
+import argparse
+import sys
+import time
+import ZODB, ZODB.FileStorage
+import settings
+from libramen import query
+
+def size(value):
+    # 10, 10k, 10m, 10g
+    units = {'k':1024, 'm':1024**2, 'g':1024**3, 't':1024**4}
+    if value[-1].lower() in units:
+        return int(float(value[:-1]) * units[value[-1].lower()])
+    return int(value)
+
+def date(value):
+    # 2014-01-31 or epoch seconds
+    try:
+        return float(value)
+    except ValueError:
+        return time.mktime(time.strptime(value, '%Y-%m-%d'))
+
+def end_date(value):
+    # Same, but a bare day means the end of it -- --before 2014-03-31 should still find files from the 31st.
+    try:
+        return float(value)
+    except ValueError:
+        day = time.strptime(value, '%Y-%m-%d')
+        # mktime rolls the 32nd over into the next month, and gets the day length right across a DST change.
+        return time.mktime((day.tm_year, day.tm_mon, day.tm_mday + 1, 0, 0, 0, 0, 0, -1)) - 0.000001
+
+def attr(value):
+    name, sep, wanted = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError("attributes look like name=value")
+    return name, wanted
+
+parser = argparse.ArgumentParser(description='Search the Ramen scan database.')
+parser.add_argument('--db', default=getattr(settings, 'DATABASE', 'data/mydata.fs'), help='database file (default: %(default)s)')
+parser.add_argument('--host')
+parser.add_argument('--product', help='filesystem handler name (ftp, local_disk, ...)')
+parser.add_argument('--glob', help="full path pattern, e.g. '/home/*/*.pst'")
+parser.add_argument('--ext', action='append', help='extension, can be given more than once')
+parser.add_argument('--min-size', type=size)
+parser.add_argument('--max-size', type=size)
+parser.add_argument('--after', type=date, help='modified on or after (YYYY-MM-DD or epoch)')
+parser.add_argument('--before', type=end_date, help='modified on or before (YYYY-MM-DD or epoch)')
+parser.add_argument('--hash', help='hex digest')
+parser.add_argument('--attr', type=attr, action='append', default=[], help='name=value of a plugin attribute')
+parser.add_argument('--folders', action='store_true', help='include folders in the results')
+parser.add_argument('--deleted', action='store_true', help='include files an incremental rescan found deleted')
+parser.add_argument('--format', choices=['json', 'csv'], default='json')
+args = parser.parse_args()
+
+storage = ZODB.FileStorage.FileStorage(args.db, read_only=True)
+db_c = ZODB.DB(storage)
+connection = db_c.open()
+db = connection.root()
+
+q = query.Query(host=args.host, product=args.product, glob=args.glob, ext=args.ext,
+                min_size=args.min_size, max_size=args.max_size, after=args.after, before=args.before,
+                hash=args.hash, attrs=dict(args.attr), folders=args.folders, deleted=args.deleted)
+
+def gc(results):
+    # Records get pulled into the connection cache as we go, keep it from growing for the whole run.
+    for count, result in enumerate(results):
+        yield result
+        if count % 10000 == 0:
+            connection.cacheGC()
+
+results = gc(q.run(db))
+try:
+    if args.format == 'csv':
+        query.write_csv(results, sys.stdout)
+    else:
+        query.write_json(results, sys.stdout)
+except IOError:
+    # Piped into head or something that went away.
+    pass
+
+connection.close()
+db_c.close()
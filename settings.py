@@ -10,3 +10,40 @@
 # Not in use.
 TARGET_LIST='targets.txt'
 MAX_THREADS=10
+# How many workers can be inside a single host at the same time.
+MAX_PER_HOST=2
+
+# Database settings
+DATABASE='data/mydata.fs'
+# The writer process commits after this many records or seconds, whichever comes first.
+COMMIT_BATCH=1000
+COMMIT_INTERVAL=30
+# How many records the workers can get ahead of the writer before they have to wait.
+WRITER_QUEUE=10000
+
+# Where the scan progress is saved for --resume, and how often (seconds).
+CHECKPOINT='data/checkpoint.pickle'
+CHECKPOINT_INTERVAL=300
+
+# Processes running the plugins, separate from the scanners.  0 runs them inline in the scanner processes.
+PLUGIN_WORKERS=4
+# How many records the scanners can get ahead of the plugins before they have to wait.
+PLUGIN_QUEUE=1000
+
+# Block size content plugins get fed in (see libramen/content.py)
+READ_BLOCKSIZE=65536
+
+# Hashing (plugins/actions/hashes.py)
+HASH_ALGORITHMS=['md5','sha1','sha256']
+# full, sampled, or auto -- auto hashes everything up to HASH_FULL_MAX bytes and samples anything bigger.  Sampled digests are stored
+# as md5_sampled etc. (md5_head over FTP/HTTP, which only get the first block), never as plain md5, and don't go in the hash index.
+HASH_MODE='auto'
+HASH_FULL_MAX=64*1024**2
+# Sampled mode hashes the head, the tail and HASH_SAMPLES blocks in between, HASH_SAMPLE_SIZE bytes each.
+HASH_SAMPLE_SIZE=65536
+HASH_SAMPLES=8
+# Hashes are remembered here between scans and reused while a file's size and mtime stay the same.  None turns it off.
+HASH_CACHE='data/hashcache.sqlite'
+
+# Only store (and run the plugins on) what changed since the last scan, and tombstone what's gone.  Same as running with --incremental.
+INCREMENTAL=False
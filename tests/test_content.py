@@ -0,0 +1,54 @@
+#!/usr/bin/python
+#
+# Feeding one read of a file to every content plugin.  Run it from the top of the tree:
+#
+#   python -m unittest tests.test_content
+#
+import unittest
+from StringIO import StringIO
+from libramen import content
+
+class found:
+    folder = False
+    relpath = '/folder/'
+    filename = 'file'
+
+class filesystem:
+    def open(self, path):
+        return StringIO('abcdef')
+
+class consumer:
+    def __init__(self, stop_after=None, broken=False):
+        self.chunks = []
+        self.finalized = False
+        self.stop_after = stop_after
+        self.broken = broken
+
+    def update(self, chunk):
+        if self.broken:
+            raise ValueError("broken plugin")
+        self.chunks.append(chunk)
+        if self.stop_after is not None and len(self.chunks) >= self.stop_after:
+            return False
+
+    def finalize(self):
+        self.finalized = True
+
+class TestFeed(unittest.TestCase):
+
+    def test_broken_consumer(self):
+        broken, fine = consumer(broken=True), consumer()
+        content.feed(found, filesystem(), [broken, fine], blocksize=2)
+        self.assertEqual(fine.chunks, ['ab', 'cd', 'ef'])
+        self.assertTrue(fine.finalized)
+        self.assertFalse(broken.finalized)
+
+    def test_stopped_consumer(self):
+        stopped, fine = consumer(stop_after=1), consumer()
+        content.feed(found, filesystem(), [stopped, fine], blocksize=2)
+        self.assertEqual(stopped.chunks, ['ab'])
+        self.assertFalse(stopped.finalized)
+        self.assertTrue(fine.finalized)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+#!/usr/bin/python
+#
+# Picking the extensions that run on a file.  Run it from the top of the tree:
+#
+#   python -m unittest tests.test_dispatch
+#
+import unittest
+from libramen import dispatch
+
+class found:
+    folder = False
+    relpath = '/etc/'
+    filename = 'setup.INI'
+    size = 10
+
+class ini:
+    MATCH = {'extensions': ['ini', 'INI', '.ini']}
+
+class home:
+    MATCH = {'path': r'(?P<top>/home/)'}
+
+class etc:
+    # Same group name as home's, and a global flag -- neither can be glued into one pattern with the others.
+    MATCH = {'path': r'(?x) (?P<top> /etc/ )'}
+
+class TestDispatch(unittest.TestCase):
+
+    def test_duplicate_extensions(self):
+        self.assertEqual(dispatch.Dispatcher([ini]).matching(found), [ini])
+
+    def test_paths(self):
+        self.assertEqual(dispatch.Dispatcher([ini, home, etc]).matching(found), [ini, etc])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+#
+# Exporting query results with names that aren't plain ASCII.  Run it from the top of the tree:
+#
+#   python -m unittest tests.test_query
+#
+import csv
+import hashlib
+import json
+import unittest
+from StringIO import StringIO
+from libramen import query
+from libramen import record
+
+class target:
+    host = 'localhost'
+    class filesystem:
+        product = 'local_disk'
+
+def found(filename):
+    fileobj = record.Record(filename, '/folder/', (0o100644, 0, 0, 1, 0, 0, 5, 0, 1400000000, 0), target)
+    fileobj.hash = hashlib.md5('hello').digest()
+    fileobj.attrs = {'md5':fileobj.hash, 'hash_mode':'full'}
+    return [('localhost', 'local_disk', '/folder/' + filename, fileobj)]
+
+class TestExport(unittest.TestCase):
+
+    def check(self, filename, shown):
+        row = json.loads(StringIO(self.json(filename)).readline())
+        self.assertEqual(row['filename'], shown)
+        self.assertEqual(row['path'], u'/folder/' + shown)
+        self.assertEqual(row['hash'], hashlib.md5('hello').hexdigest())
+        self.assertEqual(row['attrs'], {'md5':hashlib.md5('hello').hexdigest(), 'hash_mode':'full'})
+
+        out = StringIO()
+        query.write_csv(found(filename), out)
+        out.seek(0)
+        rows = list(csv.DictReader(out))
+        self.assertEqual(rows[0]['filename'].decode('utf-8'), shown)
+        self.assertEqual(rows[0]['path'].decode('utf-8'), u'/folder/' + shown)
+
+    def json(self, filename):
+        out = StringIO()
+        query.write_json(found(filename), out)
+        return out.getvalue()
+
+    def test_utf8_name(self):
+        self.check(u'caf\xe9.txt'.encode('utf-8'), u'caf\xe9.txt')
+
+    def test_not_utf8_name(self):
+        # latin-1 from some old server
+        self.check(u'caf\xe9.txt'.encode('latin-1'), u'caf\ufffd.txt')
+
+    def test_attr_match(self):
+        fileobj = found(u'caf\xe9.txt'.encode('utf-8'))[0][3]
+        self.assertTrue(query.Query(attrs={'md5':hashlib.md5('hello').hexdigest()}).matches('/folder/', fileobj))
+        self.assertTrue(query.Query(attrs={'filename':u'caf\xe9.txt'.encode('utf-8')}).matches('/folder/', fileobj))
+
+    def test_sampled_digest(self):
+        fileobj = found('big.iso')[0][3]
+        fileobj.attrs = {'md5_sampled':hashlib.md5('hello').digest(), 'hash_mode':'sampled'}
+        row = query.row('localhost', 'local_disk', '/folder/big.iso', fileobj)
+        self.assertEqual(row['attrs'], {'md5_sampled':hashlib.md5('hello').hexdigest(), 'hash_mode':'sampled'})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+#
+# Smoke test for the writer process.  Needs ZODB installed, run it from the top of the tree:
+#
+#   python -m unittest tests.test_writer
+#
+import os
+import shutil
+import tempfile
+import unittest
+import persistent
+from libramen import pathindex
+from libramen import record
+from libramen import targeting
+from libramen import writer
+
+try:
+    import ZODB, ZODB.FileStorage
+except ImportError:
+    ZODB = None
+
+class filesystem(persistent.Persistent):
+    # Just enough of a handler for the writer to store into.
+    def __init__(self, host):
+        self.product = 'smoke'
+        self.root = pathindex.PathIndex()
+
+    @property
+    def w_root(self):
+        self._p_changed = 1
+        return self.root
+
+class handler:
+    filesystem = filesystem
+
+@unittest.skipIf(ZODB is None, "ZODB isn't installed")
+class TestWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'test.fs')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_one_record(self):
+        target = targeting.target('localhost', handler)
+        writer_obj = writer.Writer([target], path=self.path)
+        writer_obj.start()
+        fileobj = record.Record('file', '/folder/', (0o100644, 0, 0, 1, 0, 0, 5, 0, 1400000000, 0), target)
+        writer_obj.put(target, '/folder/file', fileobj)
+        writer_obj.stop()
+        self.assertEqual(writer_obj.process, None)
+
+        storage = ZODB.FileStorage.FileStorage(self.path, read_only=True)
+        db_c = ZODB.DB(storage)
+        connection = db_c.open()
+        try:
+            root = connection.root()['localhost'].filesystems['smoke'].root
+            stored = root.get('/folder/file')
+            self.assertEqual(stored.size, 5)
+            self.assertEqual(stored.mtime, 1400000000)
+        finally:
+            connection.close()
+            db_c.close()
+
+if __name__ == "__main__":
+    unittest.main()